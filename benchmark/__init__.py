@@ -0,0 +1,6 @@
+"""
+Benchmarks of latex_summary and latex_singlefile on generated documents.
+
+    python -m benchmark.harness --output results.json
+    python -m benchmark.harness --compare baseline.json
+"""
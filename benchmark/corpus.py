@@ -0,0 +1,126 @@
+"""
+Generates synthetic LaTeX documents to measure the throughput of the parser.
+"""
+
+
+import os
+import random
+
+
+filler_text = (
+    "Lorem ipsum dolor sit amet, consectetur adipisicing elit, sed do "
+    "eiusmod tempor incididunt ut labore et dolore magna aliqua.")
+
+section_commands = [
+    r"\chapter{{Chapter {0}}}",
+    r"\section{{Section {0}}}",
+    r"\subsection{{Subsection {0}}}",
+    r"\paragraph{{Paragraph {0}}}",
+]
+
+directive_formats = [
+    "%!TODO: Todo number {0}. Extra text after the sentence.",
+    "%!EOL_SUMMARY: End of line summary {0}. Continues to the end.",
+    "%!SUMMARY: Summary {0}.",
+    "%!MULTILINE: Continues the previous directive {0}.",
+    "%!NI_PLAN: Plan {0} which is not an item.",
+    "%!NI_TODO: Todo {0} which is not an item.",
+    "%!DONE_TODO: Completed todo {0}.",
+    "%!DONE_SUPERVISOR_TOM: Completed comment {0}.",
+    "%!QUESTION: Question {0}?",
+    "%!MUDDLE: Unclear paragraph {0}.",
+]
+
+
+def tree_layout(n_files, include_depth):
+    """Returns the parent of each file of a tree of `n_files` files
+
+    File 0 is the main file, the others are spread evenly over
+    `include_depth` levels below it.
+    """
+    parents = [None]
+    levels = [[0]]
+    per_level = max(1, (n_files - 1) // max(1, include_depth))
+    for index in range(1, n_files):
+        level = min(include_depth, 1 + (index - 1) // per_level)
+        if len(levels) <= level:
+            levels.append([])
+        candidates = levels[level - 1]
+        parents.append(candidates[index % len(candidates)])
+        levels[level].append(index)
+    return parents
+
+
+def file_name(index):
+    if index == 0:
+        return "main.tex"
+    return os.path.join("chapters", "file{0}.tex".format(index))
+
+
+def input_command(index):
+    name = os.path.splitext(file_name(index))[0]
+    return r"\input{" + name.replace(os.sep, "/") + "}"
+
+
+def generate_corpus(
+    directory,
+    n_files=20,
+    include_depth=3,
+    lines_per_file=2000,
+    directive_density=0.05,
+    section_density=0.01,
+    seed=0,
+):
+    """Writes a document made of several files included from each other
+
+    Args:
+        directory (string): Where the document is written.
+        n_files (int, optional): Number of files including the main file.
+        include_depth (int, optional): Number of levels of included files.
+        lines_per_file (int, optional): Number of lines of text per file.
+        directive_density (float, optional): Fraction of lines which are
+         `%!` directives.
+        section_density (float, optional): Fraction of lines which are
+         sectioning commands.
+        seed (int, optional): Seed of the random generator.
+
+    Returns:
+        (string, int): The path of the main file and the total number of
+        lines of the document.
+    """
+    rand = random.Random(seed)
+    parents = tree_layout(n_files, include_depth)
+    children = [[] for _ in range(n_files)]
+    for index, parent in enumerate(parents):
+        if parent is not None:
+            children[parent].append(index)
+
+    os.makedirs(os.path.join(directory, "chapters"), exist_ok=True)
+    total_lines = 0
+    for index in range(n_files):
+        lines = []
+        if index == 0:
+            lines.extend([r"\documentclass[]{memoir}", r"\title{Benchmark}",
+                          r"\begin{document}", r"\maketitle"])
+        include_at = {}
+        for child in children[index]:
+            include_at.setdefault(
+                rand.randrange(lines_per_file), []).append(child)
+        for line_num in range(lines_per_file):
+            lines.extend(input_command(child)
+                         for child in include_at.get(line_num, []))
+            draw = rand.random()
+            if draw < section_density:
+                lines.append(rand.choice(section_commands).format(line_num))
+            elif draw < section_density + directive_density:
+                lines.append(rand.choice(directive_formats).format(line_num))
+            else:
+                lines.append(filler_text)
+        if index == 0:
+            lines.append(r"\end{document}")
+
+        with open(os.path.join(directory, file_name(index)), 'w') as f:
+            f.writelines(line + "\n" for line in lines)
+        total_lines += len(lines)
+
+    return os.path.join(directory, file_name(0)), total_lines
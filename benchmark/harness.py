@@ -0,0 +1,176 @@
+"""
+Measures the throughput and peak memory of the parser on a generated corpus.
+
+Each case runs in its own process as `latex_summary` keeps its triggers in
+module level state:
+
+    python -m benchmark.harness --output results.json
+    python -m benchmark.harness --compare baseline.json --tolerance 0.2
+"""
+
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+import contextlib
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+from benchmark.corpus import generate_corpus
+
+
+repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Command line flags of latex_summary.py for each case
+summary_cases = {
+    "summary": [],
+    "summary_only": ["-s"],
+    "file_list": ["-f"],
+    "all": ["--all"],  # the three summaries and the concatenation
+}
+# Keep regexp of latex_singlefile.py for each concatenation case
+concatenate_cases = {
+    "concatenate": "keep_text",
+    "concatenate_uncommented": "keep_uncommented_text",  # -c
+}
+cases = list(summary_cases) + list(concatenate_cases)
+
+
+def peak_memory_kb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":  # bytes instead of kilobytes
+        peak //= 1024
+    return peak
+
+
+def run_case(case, main_file):
+    """Runs a single case in the current process and returns its timings"""
+    sys.path.insert(0, repo_root)
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, \
+            contextlib.redirect_stdout(devnull):
+        if case in concatenate_cases:
+            import latex_singlefile
+            latex_singlefile.concatenate_file(
+                main_file, regex_keep=getattr(
+                    latex_singlefile, concatenate_cases[case]))
+        else:
+            import latex_summary_core
+            sys.argv = ["latex_summary.py", main_file] + summary_cases[case]
+            latex_summary_core.main()
+    return {
+        "seconds": time.perf_counter() - start,
+        "peak_memory_kb": peak_memory_kb(),
+    }
+
+
+def measure_case(case, main_file, n_lines, repeat):
+    """Runs a case `repeat` times in new processes, keeps the fastest"""
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmark.harness",
+             "--case", case, main_file],
+            cwd=repo_root, check=True, stdout=subprocess.PIPE,
+            universal_newlines=True).stdout
+        runs.append(json.loads(output))
+    best = min(runs, key=lambda run: run["seconds"])
+    best["lines_per_second"] = n_lines / best["seconds"]
+    return best
+
+
+def run_benchmarks(corpus_args, repeat=3, selected_cases=cases):
+    with tempfile.TemporaryDirectory() as directory:
+        main_file, n_lines = generate_corpus(directory, **corpus_args)
+        results = {"corpus": dict(corpus_args, lines=n_lines), "cases": {}}
+        for case in selected_cases:
+            results["cases"][case] = measure_case(
+                case, main_file, n_lines, repeat)
+    return results
+
+
+def compare_results(results, baseline, tolerance):
+    """Returns the cases slower than `baseline` by more than `tolerance`"""
+    regressions = []
+    for case, result in results["cases"].items():
+        if case not in baseline["cases"]:
+            continue
+        reference = baseline["cases"][case]["lines_per_second"]
+        if result["lines_per_second"] < reference * (1 - tolerance):
+            regressions.append((case, result["lines_per_second"], reference))
+    return regressions
+
+
+def print_results(results):
+    print("{0} lines".format(results["corpus"]["lines"]))
+    print("{0:<24}{1:>14}{2:>14}{3:>16}".format(
+        "case", "seconds", "lines/s", "peak memory kB"))
+    for case, result in results["cases"].items():
+        print("{0:<24}{1:>14.3f}{2:>14.0f}{3:>16}".format(
+            case, result["seconds"], result["lines_per_second"],
+            str(result["peak_memory_kb"])))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    parser.add_argument("main_file", nargs="?", help=argparse.SUPPRESS)
+    parser.add_argument("--files", type=int, default=20)
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--lines", type=int, default=2000,
+                        help="lines per file")
+    parser.add_argument("--directives", type=float, default=0.05,
+                        help="fraction of lines which are directives")
+    parser.add_argument("--sections", type=float, default=0.01,
+                        help="fraction of lines which are sections")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--cases", default=",".join(cases),
+                        help="comma separated list of: " + ", ".join(cases))
+    parser.add_argument("--output", help="JSON file for the results")
+    parser.add_argument("--compare", help="JSON file of baseline results")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="accepted loss of throughput against baseline")
+    args = parser.parse_args()
+
+    if args.case:
+        print(json.dumps(run_case(args.case, args.main_file)))
+        return 0
+
+    corpus_args = {
+        "n_files": args.files,
+        "include_depth": args.depth,
+        "lines_per_file": args.lines,
+        "directive_density": args.directives,
+        "section_density": args.sections,
+        "seed": args.seed,
+    }
+    results = run_benchmarks(corpus_args, args.repeat,
+                             args.cases.split(","))
+    print_results(results)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare_results(results, baseline, args.tolerance)
+        for case, speed, reference in regressions:
+            print("Regression in {0}: {1:.0f} lines/s against {2:.0f}".format(
+                case, speed, reference))
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""
+Measures the start up time of the scripts on a document of a few lines.
+
+Editor build hooks run the scripts once per save, on such documents the time
+is mostly spent importing the module and building the triggers:
+
+    python -m benchmark.startup --output startup.json
+    python -m benchmark.startup --compare startup.json --tolerance 0.2
+
+`--scripts` times the scripts of another directory, such as a checkout of
+the commit to compare against:
+
+    git worktree add /tmp/baseline <commit>
+    python -m benchmark.startup --scripts /tmp/baseline --output base.json
+    python -m benchmark.startup --compare base.json
+
+The modules are run with their bytecode cached, as once installed, even if
+`PYTHONDONTWRITEBYTECODE` is set.
+"""
+
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+from benchmark.corpus import generate_corpus
+
+
+repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Command line of each case, "{main}" is replaced by the main file
+startup_cases = {
+    "import": ["-c", "import latex_summary"],
+    "file_list": ["latex_summary.py", "{main}", "-f"],
+    "summary": ["latex_summary.py", "{main}"],
+    "concatenate": ["latex_singlefile.py", "{main}"],
+}
+cases = list(startup_cases)
+
+
+def measure_case(case, main_file, repeat, scripts=repo_root):
+    """Runs a case `repeat` times in new processes, keeps the fastest
+
+    A first run, not timed, writes the bytecode of the modules.
+    """
+    command = [sys.executable] + [
+        arg.format(main=main_file) for arg in startup_cases[case]]
+    env = dict(os.environ)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    times = []
+    for _ in range(repeat + 1):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=scripts, env=env, check=True,
+                       stdout=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return {"seconds": min(times[1:])}
+
+
+def run_benchmarks(repeat=10, selected_cases=cases, scripts=repo_root):
+    with tempfile.TemporaryDirectory() as directory:
+        main_file, n_lines = generate_corpus(
+            directory, n_files=1, include_depth=0, lines_per_file=20)
+        results = {"corpus": {"lines": n_lines}, "cases": {}}
+        for case in selected_cases:
+            results["cases"][case] = measure_case(
+                case, main_file, repeat, scripts)
+    return results
+
+
+def compare_results(results, baseline, tolerance):
+    """Returns the cases slower than `baseline` by more than `tolerance`"""
+    regressions = []
+    for case, result in results["cases"].items():
+        if case not in baseline["cases"]:
+            continue
+        reference = baseline["cases"][case]["seconds"]
+        if result["seconds"] > reference * (1 + tolerance):
+            regressions.append((case, result["seconds"], reference))
+    return regressions
+
+
+def print_results(results):
+    print("{0:<16}{1:>14}".format("case", "ms"))
+    for case, result in results["cases"].items():
+        print("{0:<16}{1:>14.1f}".format(case, 1000 * result["seconds"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--cases", default=",".join(cases),
+                        help="comma separated list of: " + ", ".join(cases))
+    parser.add_argument("--scripts", default=repo_root,
+                        help="directory of the scripts to time")
+    parser.add_argument("--output", help="JSON file for the results")
+    parser.add_argument("--compare", help="JSON file of baseline results")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="accepted increase of time against baseline")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.repeat, args.cases.split(","),
+                             os.path.abspath(args.scripts))
+    print_results(results)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare_results(results, baseline, args.tolerance)
+        for case, seconds, reference in regressions:
+            print("Regression in {0}: {1:.1f} ms against {2:.1f} ms".format(
+                case, 1000 * seconds, 1000 * reference))
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,191 @@
+"""
+Serves queries on the directives of latex documents kept in memory.
+
+Requests and answers are JSON objects, one per line, on a Unix socket or on a
+localhost TCP port:
+
+    python latex_server.py /tmp/latex_summary.sock
+    python latex_server.py localhost:8765
+
+Only loopback addresses are served, a port alone listens on 127.0.0.1.
+
+Each request names the main file of a `document`, parsed on its first
+request and then only when a "refresh" is requested:
+    - {"document": d, "query": "refresh"}: reads the files which changed;
+    - {"document": d, "query": "directives", "file": f, "type": t,
+     "done": false}: the directives, all filters are optional;
+    - {"document": d, "query": "next", "file": f, "line": n}: the first
+     directive of `f` after the line `n`;
+    - {"document": d, "query": "counts"}: number of directives of each type.
+"""
+
+
+import latex_summary_core as lxs
+import os
+import sys
+import json
+import bisect
+import asyncio
+import threading
+from collections import Counter
+
+
+class DocumentState(object):
+    """
+    Directives of a document, indexed for the queries
+
+    Files which did not change since the last refresh are replayed from a
+    `MemoryCache` rather than parsed again. The document is parsed by the
+    first `refresh`, `lock` is held by the requests using the state.
+    """
+    def __init__(self, summarizer, document):
+        super(DocumentState, self).__init__()
+        self.summarizer = summarizer
+        self.document = document
+        self.cache = lxs.MemoryCache()
+        self.lock = threading.Lock()
+        self.directives = None
+
+    def refresh(self):
+        directives = []
+        self.summarizer.parse(self.document, self.cache, directives)
+        self.directives = [dict(zip(lxs.directive_fields, directive))
+                           for directive in directives]
+        self.by_file = {}
+        for directive in self.directives:
+            self.by_file.setdefault(
+                os.path.abspath(directive["file"]), []).append(directive)
+        for file_directives in self.by_file.values():
+            file_directives.sort(key=lambda directive: directive["line"])
+        self.lines = {file_in: [directive["line"] for directive in found]
+                      for file_in, found in self.by_file.items()}
+        self.counts = Counter(
+            directive["type"] for directive in self.directives)
+
+    def query_directives(self, file=None, type=None, done=None):
+        if file is None:
+            found = self.directives
+        else:
+            found = self.by_file.get(os.path.abspath(file), [])
+        return [directive for directive in found
+                if (type is None or directive["type"] == type)
+                and (done is None or directive["done"] == done)]
+
+    def query_next(self, file, line):
+        file_in = os.path.abspath(file)
+        i = bisect.bisect_right(self.lines.get(file_in, []), line)
+        if i < len(self.lines.get(file_in, [])):
+            return self.by_file[file_in][i]
+        return None
+
+
+class DirectiveServer(object):
+    """
+    Answers the requests of the module docstring
+
+    Requests are answered in the threads of the executor of the event loop,
+    which keeps reading the requests of the other clients while a document
+    is parsed. The requests on a document wait for each other.
+    """
+    def __init__(self, summarizer):
+        super(DirectiveServer, self).__init__()
+        self.summarizer = summarizer
+        self.documents = {}
+        self.lock = threading.Lock()
+
+    def document(self, name):
+        key = os.path.abspath(name)
+        with self.lock:
+            if key not in self.documents:
+                self.documents[key] = DocumentState(self.summarizer, name)
+            return self.documents[key]
+
+    def answer(self, request):
+        try:
+            state = self.document(request["document"])
+            with state.lock:
+                return {"result": self.query(state, request)}
+        except Exception as e:
+            return {"error": "{0}: {1}".format(type(e).__name__, e)}
+
+    def query(self, state, request):
+        query = request["query"]
+        if state.directives is None or query == "refresh":
+            state.refresh()  # parsed once on the first request
+        if query == "refresh":
+            result = len(state.directives)
+        elif query == "directives":
+            result = state.query_directives(
+                request.get("file"), request.get("type"), request.get("done"))
+        elif query == "next":
+            result = state.query_next(request["file"], request["line"])
+        elif query == "counts":
+            result = state.counts
+        else:
+            raise ValueError("Unknown query : {0}".format(query))
+        return result
+
+    async def handle(self, reader, writer):
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            try:
+                request = json.loads(line)
+            except ValueError as e:
+                answer = {"error": "Invalid request: {0}".format(e)}
+            else:
+                answer = await asyncio.get_running_loop().run_in_executor(
+                    None, self.answer, request)
+            writer.write(json.dumps(answer).encode() + b"\n")
+            await writer.drain()
+        writer.close()
+
+
+def loopback_host(host):
+    """Returns the host to listen on, 127.0.0.1 if it is not given
+
+    Raises:
+        ValueError: The host is not a loopback address, the directives would
+            be served to the network.
+    """
+    import socket
+    import ipaddress
+    if not host:
+        return "127.0.0.1"
+    addresses = {info[4][0] for info in socket.getaddrinfo(
+        host.strip("[]"), None, proto=socket.IPPROTO_TCP)}
+    for address in addresses:
+        if not ipaddress.ip_address(address.split("%")[0]).is_loopback:
+            raise ValueError(
+                "Not a loopback address : {0} ({1})".format(host, address))
+    return host.strip("[]")
+
+
+async def serve(address, summarizer):
+    """Serves on a Unix socket, or on a TCP port for a "host:port" address
+
+    The host of a TCP port must be a loopback address, 127.0.0.1 if it is
+    left out ("8765" or ":8765").
+    """
+    server = DirectiveServer(summarizer)
+    host, _, port = address.rpartition(":")
+    if port.isdigit():
+        listener = await asyncio.start_server(
+            server.handle, loopback_host(host), int(port))
+    else:
+        listener = await asyncio.start_unix_server(server.handle, address)
+    print("Serving on " + address)
+    async with listener:
+        await listener.serve_forever()
+
+
+if __name__ == "__main__":
+    address = sys.argv[1]
+    input_paths = [sys.argv[i + 1] for i, arg in enumerate(sys.argv)
+                   if arg == "--input-path"]
+    summarizer = lxs.Summarizer(input_paths=input_paths, verbose=False)
+    try:
+        asyncio.run(serve(address, summarizer))
+    except KeyboardInterrupt:
+        pass
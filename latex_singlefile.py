@@ -1,12 +1,14 @@
-import latex_summary as lxs
+import latex_summary_core as lxs
 import os
 import sys
 import re
+import contextlib
 
 keep_text = r"(.*)"
+keep_uncommented_text = r'([^%]*(?<!\\)(\\%)*)*'
 
 # record format [trigger, starting state]
-lxs.file_parsing_modifiers["subfile"] = {
+subfile_recording = {
     "start_recording": {
         "type": "record", "action": [r"\begin{document}", False],
     },
@@ -14,6 +16,7 @@ lxs.file_parsing_modifiers["subfile"] = {
         "type": "record", "action": [r"\end{document}", True],
     }
 }
+lxs.file_parsing_modifiers["subfile"] = subfile_recording
 
 
 def is_recording(file_triggers, encountered_state=None):
@@ -38,19 +41,228 @@ def is_recording(file_triggers, encountered_state=None):
 
     return record_line, encountered_state
 
-def is_encountered(line, file_triggers, encountered_state):
 
-    tripped = False
-    if file_triggers is None:
-        return encountered_state, tripped
+def strip_comment(line):
+    """Returns what `keep_uncommented_text` keeps of `line`, in linear time
 
-    for modif in encountered_state:
-        check = file_triggers[modif]["action"][0] in line
-        encountered_state[modif] = encountered_state[modif] or check
-        tripped = tripped or check
+    That is the text before the first "%" which is not escaped by a single
+    backslash. As with the regexp, a run of backslashes ending the kept text
+    is dropped.
+    """
+    end = line.find("%")
+    if end < 0 and not line.endswith("\\"):
+        return line
+    if end == 0 or (end > 0 and line[end - 1] != "\\"):  # usual comment
+        return line[:end]
+    start = 0
+    while True:
+        end = line.find("%", start)
+        if end < 0:
+            end = len(line)
+        while end > start and line[end - 1] == "\\":
+            end -= 1
+        if end == start and start > 0 and line[start - 1] == "\\":
+            return line[:start]
+        while line.startswith("\\%", end):
+            end += 2
+        if end == start:
+            return line[:start]
+        start = end
+
+
+def line_keeper(regex_keep):
+    """Returns the function giving what is kept of a line, None for nothing
+
+    The two regexps of this module are replaced by functions which give the
+    same result faster.
+    """
+    if regex_keep == keep_text:
+        return lambda line: line
+    if regex_keep == keep_uncommented_text:
+        return strip_comment
+    keep_re = re.compile(regex_keep)
+
+    def keep(line):
+        m = keep_re.search(line)
+        return m.group(0) if m else None
+    return keep
+
+
+# Characters other than "\n" which `str.splitlines` breaks lines on, a line
+# read from a file stops at the first of them.
+ascii_line_breaks = "\x0b\x0c\x1c\x1d\x1e"
+line_breaks_re = re.compile("[" + ascii_line_breaks + "\x85\u2028\u2029]")
+
+
+def has_line_breaks(text):
+    if text.isascii():  # str.find is much faster than a regexp
+        return any(char in text for char in ascii_line_breaks)
+    return line_breaks_re.search(text) is not None
+
+
+class Concatenation(object):
+    """
+    Copies the lines of a document and of its included files to `file_out`
+
+    The document is walked by `lxs.walk_file`, alone or with the parsers of
+    the summaries so that the concatenation is built from the same read of
+    the document. Each file is read at once and the text between its input
+    commands is written in large chunks, as is when every line is kept.
+    `parser` detects the input commands.
+    """
+    def __init__(self, file_out, parser, regex_keep=keep_text):
+        super(Concatenation, self).__init__()
+        self.file_out = file_out
+        self.parser = parser
+        self.keep = line_keeper(regex_keep)
+        self.keep_all = regex_keep == keep_text
+        # [record triggers, encountered, record_line] of each open file
+        self.states = []
+
+    def start_file(self, file_in, n_stacks=0, file_triggers=None):
+        """Starts the recording state of `file_in`, see `is_recording`"""
+        triggers = []
+        for modif in file_triggers or ():
+            if file_triggers[modif]["type"] == "record":
+                triggers.append(file_triggers[modif]["action"])
+        record_line, _ = is_recording(file_triggers)
+        self.states.append([triggers, [False] * len(triggers), record_line])
+
+    def keep_line(self, line):
+        """Returns what is written of a line which is not an input command"""
+        triggers, encountered, record_line = self.states[-1]
+        if triggers:
+            tripped = False
+            for i, (trigger, _) in enumerate(triggers):
+                if trigger in line:
+                    encountered[i] = tripped = True
+            if tripped:
+                self.states[-1][2] = all(
+                    action ^ was for (_, action), was
+                    in zip(triggers, encountered))
+                return None
+        if record_line:
+            return self.keep(line)
+        return None
 
+    def command_line(self, line, match, text, pos, decode=None):
+        """Joins an input command spanning several lines, see `lxs.Parser`
+
+        Lines are only joined if they input a file, they are otherwise
+        written as they are.
+        """
+        joined, match, n_lines, end = self.parser.command_line(
+            line, match, text, pos, decode)
+        if n_lines > 1 and any(
+                file_re["regexp"].search(joined)
+                for file_re in self.parser.parseprops.file_parse_re):
+            return joined, match, n_lines, end
+        return line, match, 1, pos
+
+    def scan_lines(self, file_in, text=None):
+        """Yields the input commands of `file_in`, see `lxs.Parser`
+
+        The text before each input command is written when the next one is
+        looked for, the "match" of a line is its included file and file
+        triggers.
+        """
+        if text is None:
+            text = lxs.read_bytes(file_in)
+        text = lxs.FileDecoder().decode(text)
+        pos = 0
+        line_num = 0
+        for start, end, next_file, file_triggers in self.input_lines(
+                text, file_in):
+            self.write_text(text[pos:start])
+            line_num += text.count("\n", pos, start)
+            n_lines = text.count("\n", start, end) or 1
+            yield (line_num, text[start:end], (next_file, file_triggers),
+                   n_lines)
+            line_num += n_lines
+            pos = end
+        self.write_text(text[pos:])
+
+    def parse_line(self, file_in, line_num, line, match=None):
+        """Returns the file included by a line of `scan_lines`"""
+        return match
+
+    def end_file(self, file_in, n_stacks=0):
+        self.states.pop()
+
+    def write_text(self, text):
+        """Writes the lines of `text`, which holds no input command"""
+        if not text:
+            return
+        breaks = has_line_breaks(text)
+        triggers, _, record_line = self.states[-1]
+        if self.keep_all and not breaks and not triggers and record_line:
+            self.file_out.write(text if text.endswith("\n") else text + "\n")
+            return
+        lines = text.split("\n")
+        if text.endswith("\n"):
+            lines.pop()
+        if breaks:
+            lines = [line.splitlines()[0] if line else line for line in lines]
+        if not triggers and record_line:
+            kept_lines = [kept for kept in map(self.keep, lines)
+                          if kept is not None]
+        else:
+            kept_lines = [kept for kept in map(self.keep_line, lines)
+                          if kept is not None]
+        if kept_lines:
+            kept_lines.append("")
+            self.file_out.write("\n".join(kept_lines))
+
+    def input_lines(self, text, file_in):
+        """Yields the start, end and included file of each input command
+
+        Only the lines holding the name of a file command after a backslash
+        are given to `detect_file` when the file triggers have the shape of
+        `lxs.build_file_parse_re`. They are found by a single regexp search
+        of the whole text. A command whose braces are left open ends on the
+        line closing them.
+        """
+        parseprops = self.parser.parseprops
+        if parseprops.candidate_lines_only(False):
+            commands_re = re.compile(r"\\(?:" + "|".join(
+                file_re["pattern"] for file_re in parseprops.file_parse_re)
+                + ")")
+            hits = [m.start() for m in commands_re.finditer(text)]
+            every_line = False
+        else:
+            hits = [0]  # from the start of each line
+            every_line = True
+
+        pos = 0
+        for hit in hits:
+            if hit < pos:
+                continue
+            line_start = text.rfind("\n", pos, hit) + 1 or pos
+            line_end = text.find("\n", hit)
+            line_end = len(text) if line_end < 0 else line_end + 1
+            pos = line_end
+            text_line = text[line_start:line_end]
+            if not (every_line or text_line.lstrip().startswith("\\")):
+                continue
+            line = text_line.splitlines()[0]
+            if "{" in line:
+                line, _, _, pos = self.command_line(line, None, text, pos)
+            if every_line and pos < len(text):
+                hits.append(pos)
+            next_file, next_file_triggers = self.parser.detect_file(
+                line, file_in)
+            if next_file:
+                yield line_start, pos, next_file, next_file_triggers
+
+    def concatenate(self, file_in, n_stacks=0, file_triggers=None):
+        """Writes `file_in` and its included files"""
+        lxs.walk_file(file_in, [self], n_stacks, file_triggers)
+
+
+def concatenated_file_name(file_in):
+    file, ext = os.path.splitext(file_in)
+    return file + "_auto_concatenate" + ext
 
-    return encountered_state, tripped
 
 def concatenate_file(
     file_in,
@@ -59,51 +271,38 @@ def concatenate_file(
     regex_keep=keep_text,
     file_triggers=None,
 ):
-    keep_re = re.compile(regex_keep)
-    record_line, encountered_state = is_recording(file_triggers)
+    """Writes `file_in` with its included files to `file_out`
 
-    if n_stacks == 0:
-        pass
+    `file_out` is a file object, by default the file of
+    `concatenated_file_name`, only replaced if its content changed.
+    """
     if file_out is None:
-        file, ext = os.path.splitext(file_in)
-        new_file = file + "_auto_concatenate" + ext
-        file_out = open(new_file, 'w')
-
-    with open(file_in, 'r') as f:
-        for line_num, lines in enumerate(f):
-            line = lines.splitlines()[0]
+        with lxs.replaced_file(concatenated_file_name(file_in)) as f:
+            concatenate_file(file_in, f, n_stacks, regex_keep, file_triggers)
+        return
 
-            next_file, next_file_triggers = lxs.detect_file(line, file_in)
-            if next_file:
-                print("Next file : " + next_file)
-                concatenate_file(
-                    next_file, file_out,
-                    n_stacks=n_stacks + 1,
-                    regex_keep=regex_keep,
-                    file_triggers=next_file_triggers,
-                )
-            else:
-                record_line, encountered_state = is_recording(
-                    file_triggers,
-                    encountered_state=encountered_state,
-                )
-                encountered_state, tripped = is_encountered(
-                    line, file_triggers, encountered_state)
-
-                m = keep_re.search(line)
-                if m and record_line and not tripped:
-                    file_out.write(m.group(0) + "\n")
-
-    if n_stacks == 0:
-        file_out.close()
+    concatenation = Concatenation(
+        file_out, lxs.module_parser(do_process_record=False), regex_keep)
+    concatenation.concatenate(file_in, n_stacks, file_triggers)
 
 
 if __name__ == "__main__":
     file_name = sys.argv[1]
-    if len(sys.argv) > 1:
-        if "-c" in sys.argv:
-            keep_text = r'([^%]*(?<!\\)(\\%)*)*'
-    concatenate_file(
-        file_name,
-        regex_keep=keep_text,
-    )
+    regex_keep = keep_text
+    if "-c" in sys.argv:  # without the comments
+        regex_keep = keep_uncommented_text
+    output = contextlib.nullcontext()  # file of concatenated_file_name
+    log = contextlib.nullcontext()
+    if "-o" in sys.argv:  # output file, "-" for the standard output
+        output_name = sys.argv[sys.argv.index("-o") + 1]
+        if output_name == "-":
+            output = lxs.standard_output()
+            log = contextlib.redirect_stdout(sys.stderr)  # keeps it clean
+        else:
+            output = lxs.replaced_file(output_name)
+    with log, output as file_out:
+        concatenate_file(
+            file_name,
+            file_out,
+            regex_keep=regex_keep,
+        )
@@ -0,0 +1,3443 @@
+"""
+Parses latex documents for %!(SU[M]+A[R]+Y) and %!TODO and sections to build
+a summary.
+
+The command line is `latex_summary.py`, which imports this module so that
+Python compiles it once and then loads it from its cached bytecode.
+"""
+
+
+import io
+import os
+import re
+import sys
+import copy
+import stat
+import time
+import hashlib
+import contextlib
+from collections import OrderedDict
+# The modules of the optional features (ast, json, glob, shutil, sqlite3,
+# tempfile, select, struct, ctypes, concurrent.futures, traceback) are
+# imported where they are used, so that a plain run or `latex_singlefile.py`
+# starts without loading them.
+
+
+file_parse_triggers = [
+    r"input",
+    r"include",
+    r"import",
+    r"subfile",
+]
+
+file_parsing_modifiers = {trigger: None for trigger in file_parse_triggers}
+
+
+line_record_triggers = [
+    r"title",
+    r"maketitle",
+    r"chapter",
+    r"[sub]*section",
+    r"frontmatter",
+    r"paragraph",
+    r"appendix",
+    r"[a-z]*matter",
+    r"pagenumbering",
+]
+file_capture = r"[\{\,\;] *([^\(\)\{\}\|\,\;]*) *[\}\,\;](.*)"
+
+# Encodings tried in turn on each file, see `FileDecoder`. They must write
+# "\n", "\\" and "%" as ASCII does, the last one should decode any byte.
+file_encodings = ["utf-8", "latin-1"]
+
+
+default_pattern_type = {"item": True}
+removed_pattern_type = {"removed": True}  # see `select_phrase_triggers`
+default_command_type = {"line": True}
+
+phrase_record_triggers = [
+    r"TO+DO+",
+    r"SU[M]+A[R]+Y",
+    r"MULT[ILINE]*",
+    r"MUD+[LED]*",
+    r"PLAN",
+    r"REP[EA]*[TION]*",
+    r"QUESTIONS*",
+    r"SUPERVISOR_*[TOM]*",
+    r"BADREF[ERENCE]*",
+    r"OPT[IONAL]*_*TO+DO+",
+    r"IDEA",
+    r"CUSTOM_TRIG+ER_LINE",
+    r"CUSTOM_TRIG+ER_PHRASE",
+    r"CUSTOM_TRIG+ER_FILE",
+]
+re_comment = re.compile("\\s*%")
+
+recognise_directive = r"%! *"
+end_of_keyword = r" *:* *"
+capture_sentence = r"([^\.!\?]*[\.!\?]*)"
+
+modifier_fullline = r"EOL[ _]*"
+modifier_noitem = r"NI[ _]*"
+modifier_doneitem = r"DONE[ _]*"
+capture_restofline = r"(.*)"
+
+input_str = '__INPUT__'
+
+default_specifier = {
+    'recognise': recognise_directive,  # The pattern to recognise at the start
+    'pattern_prefix': '',  # Allows a change of behaviour with a prefix
+    'precapture': end_of_keyword,  # After the pattern, to be discarded
+    'capture': capture_sentence,  # What is read and copied into the summary
+    'typemodif': {},  # Dictionary modification from the default type
+    # The order in which fields are set
+    're_fields': ['recognise', 'pattern_prefix', input_str,
+                  'precapture', 'capture']
+}
+partial_specifiers = {
+    'full_line': {
+        'pattern_prefix': modifier_fullline,
+        'capture': capture_restofline,
+    },
+    'not_item': {
+        'pattern_prefix': modifier_noitem,
+        'typemodif': {"item": False},
+    },
+    'item_done': {
+        'pattern_prefix': modifier_doneitem,
+        'typemodif': {"color": "Gray", "done": True},
+    },
+    'full_line_done': {
+        'pattern_prefix': ("(?:" + modifier_fullline + modifier_doneitem + "|"
+                           + modifier_doneitem + modifier_fullline + ")"),
+        'capture': capture_restofline,
+        'typemodif': {"color": "Gray", "done": True},
+    },
+}
+
+# Global controlling the change of name imposed to the counter when using
+# "done", is also printed in the legend is used in a string comparison
+done_marker = " (completed)"
+default_name_change = '_auto_summary'
+
+# Size above which the least recently used parse cache entries are deleted
+default_cache_size = 64 * 1024 * 1024
+
+
+def generate_capture_specifiers(default_specifier, partial_specifiers):
+    capture_specifiers = OrderedDict(
+        [('default', dict(default_specifier))],
+    )
+
+    for new_spec in partial_specifiers:
+        if input_str in partial_specifiers[new_spec]:
+            raise KeyError(
+                "Key '{0}' is reserved and cannot be in "
+                "partial_specifiers['{1}']".format(input_str, new_spec))
+        capture_specifiers[new_spec] = {
+            **default_specifier, **partial_specifiers[new_spec]}
+
+    return capture_specifiers
+
+
+capture_specifiers = generate_capture_specifiers(
+    default_specifier, partial_specifiers)
+
+
+def command_name_to_re_string(command):
+    return r"^\s*(\\" + command + ".*)"
+
+
+def pattern_name_to_re_string(pattern,
+                              capture_specifier=capture_specifiers['default']):
+
+    specifier = dict(capture_specifier)
+    specifier[input_str] = pattern
+    re_str = ''
+
+    for field in specifier['re_fields']:
+        re_str += specifier[field]
+    return re_str
+
+
+"""
+LaTeX output formatting module attributes.
+"""
+section_spacing = r"\vspace{-36pt}\hspace{11pt}"
+start_item = "    \\begin{itemize}[noitemsep]"
+start_enum = "    \\begin{enumerate}[noitemsep]"
+end_item = "    \\end{itemize}"
+end_enum = "    \\end{enumerate}"
+item_str = "        \\item "
+color_format = "{{\color{{{0}}}{1}}}"
+label_format = "\label{{autosec:{0}}}"
+ref_format = "\\ref{{autosec:{0}}}"
+location_format = "        % {0}:{1}"
+
+
+def build_regex_list(patterns):
+    return [re.compile(pattern) for pattern in patterns]
+
+
+def build_file_parse_re(commands):
+
+    patterns = [r"^\s*\\" + c + file_capture for c in commands]
+    temp_file_parse_re = []
+
+    for command, regexp in zip(commands, build_regex_list(patterns)):
+        temp_file_parse_re.append({
+            "pattern": command,
+            "regexp": regexp,
+        })
+
+    return temp_file_parse_re
+
+
+# Lines after its first one a command with open braces can span
+max_command_lines = 20
+brace_tokens_re = re.compile(r"\\.|[\{\}%]")
+
+
+def brace_depth(line):
+    """Returns the braces `line` leaves open and the start of its comment
+
+    Escaped characters (`\\{`, `\\%`...) are skipped. The comment starts at
+    `len(line)` if there is none.
+    """
+    depth = 0
+    for m in brace_tokens_re.finditer(line):
+        token = m.group()
+        if token == "{":
+            depth += 1
+        elif token == "}":
+            depth -= 1
+        elif token == "%":
+            return depth, m.start()
+    return depth, len(line)
+
+
+def join_command(line, text, pos, max_lines=max_command_lines, decode=None):
+    """Joins a command whose braces are left open with the lines it spans
+
+    The lines following `line` are read from `text` at the offset `pos`,
+    each is added as latex reads it: without its comment and leading
+    whitespace, after a space unless the previous line ended with a comment.
+    A command is only joined if its braces are closed before a blank line, a
+    line with a directive ("%!"), the end of the text or `max_lines` lines.
+    If `text` is bytes, `decode` turns its lines into strings.
+
+    Returns:
+        (str, int, int): The command on a single line, the number of lines
+        joined to `line` and the offset of the line after them. `line`, 0
+        and `pos` if the command is not joined.
+    """
+    depth, end = brace_depth(line)
+    if depth <= 0:
+        return line, 0, pos
+    parts = [line[:end]]
+    commented = end < len(line)
+    start = pos
+    n_lines = 0
+    while depth > 0:
+        if n_lines == max_lines or start >= len(text):
+            return line, 0, pos
+        stop = text.find(b"\n" if decode else "\n", start)
+        stop = len(text) if stop < 0 else stop + 1
+        next_line = text[start:stop]
+        if decode is not None:
+            next_line = decode(next_line)
+        # As reading the file line by line, see `Parser.scan_every_line`
+        next_line = next_line.splitlines()[0]
+        if not next_line.strip() or "%!" in next_line:
+            return line, 0, pos
+        line_depth, end = brace_depth(next_line)
+        depth += line_depth
+        parts.append(("" if commented else " ") + next_line[:end].lstrip())
+        commented = end < len(next_line)
+        start = stop
+        n_lines += 1
+    return "".join(parts), n_lines, start
+
+
+class FileDecoder(object):
+    """
+    Decodes the parts of a file with the first of `file_encodings` which
+    decodes all of them
+
+    Only the lines which can match a trigger are usually decoded, the
+    encoding is therefore detected on them: it changes to the next one of
+    the list when a part does not decode.
+    """
+    def __init__(self, encodings=None):
+        super(FileDecoder, self).__init__()
+        self.encodings = list(
+            file_encodings if encodings is None else encodings)
+        self.index = 0
+
+    @property
+    def encoding(self):
+        return self.encodings[self.index]
+
+    def decode(self, data):
+        while True:
+            try:
+                return data.decode(self.encodings[self.index])
+            except UnicodeDecodeError:
+                if self.index + 1 == len(self.encodings):
+                    raise
+                self.index += 1
+
+
+def read_bytes(file_in):
+    """Returns the content of `file_in` with its line endings as "\n"
+
+    The line endings are the ones of a file read as text, which translates
+    "\r\n" and "\r".
+    """
+    with open(file_in, 'rb') as f:
+        data = f.read()
+    if b"\r" in data:
+        data = data.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+    return data
+
+
+def read_text(file_in):
+    """Returns the text of `file_in`, decoded by a `FileDecoder`"""
+    return FileDecoder().decode(read_bytes(file_in))
+
+
+def build_summary_parse_re(commands, patterns, keep=None):
+    """Returns the regexps and types of the line and phrase triggers
+
+    Args:
+        keep (function): If set, a phrase trigger is only compiled if
+            `keep(pattern, specifier, re_type)` is True, for each of its
+            `capture_specifiers` variants.
+    """
+
+    # Set all patterns type as "item" -> will trigger a new item
+    cmd_offset = 0
+    pat_offset = len(commands)
+    pat_range = range(pat_offset, pat_offset + len(patterns))
+    re_type = []
+    re_strings = []
+
+    re_type.extend([dict(default_command_type) for _ in commands])
+    re_type.extend([dict(default_pattern_type) for _ in patterns])
+
+    re_type[pat_offset + 0]["todo"] = True
+    re_type[pat_offset + 0]["color"] = "red"
+    re_type[pat_offset + 0]["count"] = "todo"
+    re_type[pat_offset + 0]["legend"] = "An item that needs doing."
+
+    re_type[pat_offset + 1]["count"] = "summary"
+    re_type[pat_offset + 1]["legend"] = "Summary of written a paragraph."
+
+    re_type[pat_offset + 2]["multiline"] = True
+    re_type[pat_offset + 2]["item"] = False
+
+    re_type[pat_offset + 3]["muddle"] = True
+    re_type[pat_offset + 3]["color"] = "OliveGreen"
+    re_type[pat_offset + 3]["count"] = "muddle"
+    re_type[pat_offset + 3]["legend"] = "A paragraph where the point is" +\
+        " not clear."
+
+    re_type[pat_offset + 4]["color"] = "blue"
+    re_type[pat_offset + 4]["count"] = "plan"
+    re_type[pat_offset + 4]["legend"] = "planned paragraph or idea."
+
+    re_type[pat_offset + 5]["color"] = "DarkOrchid"
+    re_type[pat_offset + 5]["count"] = "repetition"
+    re_type[pat_offset + 5]["legend"] = "Paragraph is repeated."
+
+    re_type[pat_offset + 6]["color"] = "ForestGreen"
+    re_type[pat_offset + 6]["count"] = "question"
+    re_type[pat_offset + 6]["todo"] = True
+    re_type[pat_offset + 6]["legend"] = "question to ask."
+
+    re_type[pat_offset + 7]["color"] = "WildStrawberry"
+    re_type[pat_offset + 7]["count"] = "supervisor(Tom)"
+    re_type[pat_offset + 7]["prefix"] = "Tom: "
+    re_type[pat_offset + 7]["legend"] = "Comment from TOM."
+
+    re_type[pat_offset + 8]["color"] = "Periwinkle"
+    re_type[pat_offset + 8]["count"] = "bad reference"
+    re_type[pat_offset + 8]["prefix"] = "ref: "
+    re_type[pat_offset + 8]["legend"] = "bad or missing reference."
+
+    re_type[pat_offset + 9] = dict(re_type[pat_offset + 0])  # = todo
+    re_type[pat_offset + 9]["color"] = "Orange"
+    re_type[pat_offset + 9]["count"] = "optional todo"
+    re_type[pat_offset + 9]["legend"] = "An item that it would be nice to do."
+    re_type[pat_offset + 9]["suffix"] = " (optional todo)"
+
+    re_type[pat_offset + 10] = dict(re_type[pat_offset + 0])  # = todo
+    re_type[pat_offset + 10]["color"] = "teal"
+    re_type[pat_offset + 10]["count"] = "idea"
+    re_type[pat_offset + 10]["legend"] = "An idea that should be explored."
+    re_type[pat_offset + 10]["prefix"] = " Idea: "
+
+    # Modify the list of regexps to add functionality
+    re_type[pat_offset + 11]["modifier"] = "line_record_triggers"
+    re_type[pat_offset + 12]["modifier"] = "phrase_record_triggers"
+    re_type[pat_offset + 13]["modifier"] = "file_parse_triggers"
+
+    re_type[cmd_offset + 0] = {"title": True}  # \title{}
+    re_type[cmd_offset + 1] = {"title": False}  # \maketitle
+    re_type[cmd_offset + 2]["section"] = True  # \chapter{}
+    re_type[cmd_offset + 2]["count"] = "section"  # \chapter{}
+    re_type[cmd_offset + 3]["section"] = True  # \[sub]*section{}
+    re_type[cmd_offset + 3]["count"] = "section"  # \[sub]*section{}
+    re_type[cmd_offset + 4] = {"title": False}  # \frontmatter
+
+    for d in re_type:
+        d["active"] = True
+
+    re_strings.extend([command_name_to_re_string(c) for c in commands])
+
+    re_strings, re_type = apply_capture_specifiers(
+        patterns, re_type, pat_range,
+        re_strings, capture_specifiers)
+
+    if keep is not None:
+        re_strings, re_type = select_phrase_triggers(
+            re_strings, re_type,
+            [None] * pat_offset + phrase_triggers(patterns), keep)
+
+    return build_regex_list(re_strings), re_type, \
+        {"cmd": cmd_offset, "pattern": pat_offset}
+
+
+def select_phrase_triggers(re_strings, re_type, triggers, keep):
+    """Returns the `re_strings` and `re_type` of the triggers kept by `keep`
+
+    `triggers` gives the (pattern, specifier) of each phrase trigger, as
+    made by `apply_capture_specifiers`, and None for the triggers always
+    kept. A phrase trigger is kept if `keep(pattern, specifier, re_type)` is
+    True. Each run of triggers left out is replaced by a single regexp
+    matching any of them, of type `removed_pattern_type`: a directive left
+    out still hides the directives after it on the line.
+    """
+    selected_strings = []
+    selected_type = []
+    removed = []
+    for re_string, pat_type, trigger in zip(re_strings, re_type, triggers):
+        if trigger is not None and not keep(*trigger, pat_type):
+            removed.append(trigger)
+            continue
+        if removed:
+            selected_strings.append(removed_phrase_re_string(removed))
+            selected_type.append(dict(removed_pattern_type))
+            removed = []
+        selected_strings.append(re_string)
+        selected_type.append(pat_type)
+    if removed:
+        selected_strings.append(removed_phrase_re_string(removed))
+        selected_type.append(dict(removed_pattern_type))
+    return selected_strings, selected_type
+
+
+def phrase_triggers(patterns):
+    """Returns the (pattern, specifier) of the triggers of `patterns`, in the
+    order of `apply_capture_specifiers`"""
+    return [(p, spec) for spec in capture_specifiers for p in patterns]
+
+
+def removed_phrase_re_string(triggers):
+    """Returns a regexp string matching where any of the phrase `triggers`
+    (pattern, specifier) would match"""
+    keywords = [capture_specifiers[spec]['pattern_prefix'] + "(?:" + p + ")"
+                for p, spec in triggers]
+    return (recognise_directive + "(?:" + "|".join(keywords) + ")"
+            + end_of_keyword + capture_sentence)
+
+
+def apply_capture_specifiers(patterns, re_type, pat_range,
+                             re_strings=[],
+                             capture_specifiers=capture_specifiers):
+    """Applies multiple capture specifiers to a set of capture patterns
+
+    Args:
+        patterns (string|list): a list of pattern strings which are recognised
+         (e.g.: SUMMARY, PLAN, TODO, etc...)
+        re_type (dict|list): Dictionaries which customise the behaviour of the
+         tool for each patter (recommended keys:
+             - 'color': <valid latex color string>;
+             - 'count': <A name for the item type>;
+             - 'description': <A legend for the type of item>.)
+        pat_range (range()): The range of items of re_type which correspond to
+         `patterns`
+        re_strings (list, optional): list of re_strings preceding the ones
+         which will be added.
+        capture_specifiers (dictionaries, optional): See the definition of the
+         module level variable `capture_specifiers`.
+
+    Returns:
+        (string|list, dict|list): The strings which will be used for regexp and
+        a full list of dictionary descriptors for each re_string. There will be
+        one item in each list for each combination of
+        PATTERNS x CAPTURE_SPECIFIERS
+    """
+    for spec in capture_specifiers:
+        re_strings.extend([
+            pattern_name_to_re_string(p, capture_specifiers[spec])
+            for p in patterns])
+        if spec != 'default':
+            modifiers = capture_specifiers[spec]['typemodif']
+            for i in pat_range:
+                re_type.append(dict(re_type[i]))
+                for modif in modifiers:
+                    re_type[-1][modif] = modifiers[modif]
+    return re_strings, re_type
+
+
+def re_string_has_alternation(re_string):
+    """Checks if a regexp string has a '|' outside of any group or class"""
+    depth = 0
+    in_class = False
+    escaped = False
+    for char in re_string:
+        if escaped:
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif in_class:
+            in_class = char != "]"
+        elif char == "[":
+            in_class = True
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "|" and depth == 0:
+            return True
+    return False
+
+
+class RecordMatcher(object):
+    """
+    Finds which of the `summary_parse_re` patterns `detect_record` would use.
+
+    Trying every pattern on every line is slow as most lines of a document
+    contain no directive and no command. The patterns generated by
+    `command_name_to_re_string` and `pattern_name_to_re_string` are grouped
+    in two combined regexps, each alternative being a named group whose name
+    is the index of the pattern in the list:
+        - Line patterns can only match at the start of the line (after
+         whitespace) and are all tried at once by a single anchored `match`;
+        - Phrase patterns can only match where a `%!` is found and are tried
+         at once at each occurrence of `%!` in the line.
+    Alternatives are tried in list order, so the smallest index across the
+    groups is the pattern the linear scan would have stopped at. Patterns
+    that do not have one of these shapes are searched as before, in order.
+
+    Compiling the combined regexps costs about as much as trying the
+    patterns in turn on a few thousand lines: the first `linear_lines` lines
+    are matched by trying the patterns in turn, the regexps are only
+    compiled for the documents with more lines to match.
+    """
+    group_name = "_p{0}"
+    phrase_tails = (
+        end_of_keyword + capture_sentence,
+        end_of_keyword + capture_restofline,
+    )
+    line_head = command_name_to_re_string("")[:-len(".*)")]
+    linear_lines = 4096
+
+    def __init__(self, summary_parse_re):
+        super(RecordMatcher, self).__init__()
+        self.source = summary_parse_re
+        self.source_len = len(summary_parse_re)
+        self.patterns = list(summary_parse_re)
+
+        self.line_alternatives = []
+        self.phrase_alternatives = []
+        self.generic = []
+        for index, pat_re in enumerate(self.patterns):
+            head, kind = self._split_pattern(pat_re)
+            name = self.group_name.format(index)
+            if kind == "line":
+                self.line_alternatives.append(
+                    "(?P<{0}>\\\\{1})".format(name, head))
+            elif kind == "phrase":
+                self.phrase_alternatives.append(
+                    "(?P<{0}>{1})".format(name, head))
+            else:
+                self.generic.append((index, pat_re))
+
+        # Built by `build` once `linear_lines` lines were matched
+        self.lines_before_build = self.linear_lines
+        self.line_re = None
+        self.phrase_re = None
+        self.searched = None  # `generic` and the alternatives not combined
+
+    def build(self):
+        """Compiles the combined regexps used by `first_match`
+
+        `searched` is set last, the parsers of a `Summarizer` share its
+        matcher and only use the regexps once it is set.
+        """
+        searched = list(self.generic)
+        self.line_re = self._build_alternatives(
+            r"^\s*(?:{0})", self.line_alternatives, searched)
+        self.phrase_re = self._build_alternatives(
+            r"(?:{0})", self.phrase_alternatives, searched)
+        self.searched = searched
+
+    def is_stale(self, summary_parse_re):
+        return (summary_parse_re is not self.source
+                or len(summary_parse_re) != self.source_len)
+
+    def _split_pattern(self, pat_re):
+        """Returns the part of a pattern which decides if it matches"""
+        if pat_re.flags != re.UNICODE:
+            return None, None
+        re_string = pat_re.pattern
+        if (re_string.startswith(self.line_head)
+                and re_string.endswith(".*)")):
+            command = re_string[len(self.line_head):-len(".*)")]
+            if "|" not in command:
+                return command, "line"
+        if re_string.startswith("%!"):
+            for tail in self.phrase_tails:
+                head = re_string[:-len(tail)]
+                if (re_string.endswith(tail)
+                        and not re_string_has_alternation(head)):
+                    return head, "phrase"
+        return None, None
+
+    def _build_alternatives(self, template, alternatives, searched):
+        if not alternatives:
+            return None
+        try:
+            return re.compile(template.format("|".join(alternatives)))
+        except re.error:
+            # The patterns do not combine, fall back on trying them in turn
+            for alternative in alternatives:
+                index = int(re.match(r"\(\?P<_p(\d+)>", alternative).group(1))
+                searched.append((index, self.patterns[index]))
+            searched.sort(key=lambda x: x[0])
+            return None
+
+    def first_match(self, line):
+        """Returns the index and match of the first pattern matching `line`
+
+        Returns (None, None) if no pattern matches.
+        """
+        if self.lines_before_build > 0:
+            self.lines_before_build -= 1
+            return self.linear_match(line)
+        if self.searched is None:
+            self.build()
+        best = len(self.patterns)
+
+        if self.line_re is not None:
+            m = self.line_re.match(line)
+            if m:
+                best = int(m.lastgroup[2:])
+
+        if self.phrase_re is not None:
+            pos = line.find("%!")
+            while pos >= 0:
+                m = self.phrase_re.match(line, pos)
+                if m:
+                    best = min(best, int(m.lastgroup[2:]))
+                pos = line.find("%!", pos + 1)
+
+        for index, pat_re in self.searched:
+            if index >= best:
+                break
+            m = pat_re.search(line)
+            if m:
+                return index, m
+
+        if best == len(self.patterns):
+            return None, None
+        return best, self.patterns[best].search(line)
+
+    def linear_match(self, line):
+        """`first_match` trying the patterns in turn"""
+        for index, pat_re in enumerate(self.patterns):
+            m = pat_re.search(line)
+            if m:
+                return index, m
+        return None, None
+
+
+class ProfiledRecordMatcher(RecordMatcher):
+    """
+    `RecordMatcher` trying the patterns one by one to time each of them
+
+    Used by `Profiler`, the statistics of each pattern are accumulated in
+    `profiler.patterns` as [attempts, hits, seconds] keyed by the pattern.
+    """
+    def __init__(self, summary_parse_re, profiler):
+        super(ProfiledRecordMatcher, self).__init__(summary_parse_re)
+        self.profiler = profiler
+
+    def first_match(self, line):
+        stats = self.profiler.patterns
+        for index, pat_re in enumerate(self.patterns):
+            pattern_stats = stats.setdefault(pat_re.pattern, [0, 0, 0.0])
+            start = time.perf_counter()
+            m = pat_re.search(line)
+            pattern_stats[2] += time.perf_counter() - start
+            pattern_stats[0] += 1
+            if m:
+                pattern_stats[1] += 1
+                return index, m
+        return None, None
+
+
+class ParsingProperties(object):
+    """
+    Class handling the regular expressions used for parsing the file
+
+    There are 3 main types of expression to capture 3 types of triggers:
+        - File triggers: Indicates a latex file input command the text captured
+         must correspond to a valid file path;
+        - Line triggers: The entire line will be copied into the summary file,
+         used to mirror the document structure for sections, and titles (for
+         example);
+        - Sentence triggers: Captures specially formatted comments used to
+         build the summary file (e.g. SUMMARY, PLAN, TODO, etc..)
+
+    During object instantiation the `__init__()` uses module level defaults,
+    customisation is then possible in code via the `add_...` methods and in
+    latex via the special sentence triggers:
+        - `%! CUSTOM_TRIGGER_LINE: <your custom trigger>`
+        - `%! CUSTOM_TRIGGER_PHRASE: <your custom trigger>`
+        - `%! CUSTOM_TRIGGER_FILE: <your custom trigger>`
+
+    """
+    matcher_class = RecordMatcher
+
+    def __init__(self,):
+        super(ParsingProperties, self).__init__()
+        self.file_parse_re = build_file_parse_re(file_parse_triggers)
+        self.file_capture_re = re.compile(file_capture)
+
+        # Record triggers are compiled on first use, see `summary_tables`
+        self._summary_tables = None
+        self.type_selections = []  # see `select_types`
+        self.custom_phrase_triggers = []  # see `add_phrase_record_triggers`
+        self.file_parsing_modifiers = dict(file_parsing_modifiers)
+        self.matcher = None
+        self._file_command_re = None
+
+    def summary_tables(self):
+        """Returns `summary_parse_re`, `summary_parse_re_types` and
+        `summary_starts`, building them from the module triggers first
+
+        Compiling the line and phrase triggers is most of the cost of a
+        `ParsingProperties`, it is skipped by the modes which do not process
+        records (`-f`, the concatenation of `latex_singlefile.py`).
+        """
+        if self._summary_tables is None:
+            self._summary_tables = list(build_summary_parse_re(
+                line_record_triggers, phrase_record_triggers,
+                self.keeps_phrase_trigger if self.type_selections else None))
+        return self._summary_tables
+
+    @property
+    def summary_parse_re(self):
+        return (self._summary_tables or self.summary_tables())[0]
+
+    @summary_parse_re.setter
+    def summary_parse_re(self, value):
+        self.summary_tables()[0] = value
+
+    @property
+    def summary_parse_re_types(self):
+        return (self._summary_tables or self.summary_tables())[1]
+
+    @summary_parse_re_types.setter
+    def summary_parse_re_types(self, value):
+        self.summary_tables()[1] = value
+
+    @property
+    def summary_starts(self):
+        return (self._summary_tables or self.summary_tables())[2]
+
+    def record_matcher(self):
+        """Returns a `RecordMatcher` up to date with `summary_parse_re`"""
+        if (self.matcher is None
+                or self.matcher.is_stale(self.summary_parse_re)):
+            self.matcher = self.matcher_class(self.summary_parse_re)
+        return self.matcher
+
+    def file_command_re(self):
+        """Returns a regexp matching the start of the file commands
+
+        Only the file triggers built by `build_file_parse_re` are matched,
+        up to the character opening the name of the file.
+        """
+        if (self._file_command_re is None
+                or self._file_command_re[0] is not self.file_parse_re
+                or self._file_command_re[1] != len(self.file_parse_re)):
+            commands = [
+                file_re["pattern"] for file_re in self.file_parse_re
+                if file_re["regexp"].pattern
+                == r"^\s*\\" + file_re["pattern"] + file_capture]
+            self._file_command_re = (
+                self.file_parse_re, len(self.file_parse_re), re.compile(
+                    r"^\s*\\(?:" + "|".join(commands) + r")[\{\,\;]"
+                    if commands else r"(?!)"))
+        return self._file_command_re[2]
+
+    def candidate_lines_only(self, do_process_record=True):
+        """True if the triggers only match lines `Parser.scan_lines` yields
+
+        True for the triggers built by `command_name_to_re_string`,
+        `pattern_name_to_re_string` and `build_file_parse_re`. Only the file
+        triggers are checked if not `do_process_record`.
+        """
+        matcher = self.record_matcher() if do_process_record else None
+        for _, pat_re in matcher.generic if matcher else ():
+            if (pat_re.flags != re.UNICODE
+                    or re_string_has_alternation(pat_re.pattern)
+                    or not (pat_re.pattern.startswith("%!")
+                            or pat_re.pattern.startswith(matcher.line_head))):
+                return False
+        for file_re in self.file_parse_re:
+            if (file_re["regexp"].flags != re.UNICODE
+                    or not file_re["regexp"].pattern.startswith(r"^\s*\\")):
+                return False
+        return True
+
+    def trigger_fingerprint(self, do_process_record=True):
+        """Hashes the patterns which decide what is matched in a file
+
+        The types are part of the fingerprint as they decide which modifiers
+        are active and so how the patterns change along the file. Only the
+        file triggers are hashed if not `do_process_record`, the record
+        triggers are then neither used nor built.
+        """
+        patterns = []
+        if do_process_record:
+            patterns.extend([(pat_re.pattern, pat_re.flags)
+                             for pat_re in self.summary_parse_re])
+        patterns.extend([(file_re["pattern"], file_re["regexp"].pattern)
+                         for file_re in self.file_parse_re])
+        if do_process_record:
+            patterns.append(self.summary_parse_re_types)
+        return hashlib.sha256(repr(patterns).encode()).hexdigest()
+
+    def keep_only_summaries(self):
+        """Keeps only the summaries and their continuations (`-s`)"""
+        self.select_types(["SUMMARY"], modifiers=False,
+                          specifiers=["default"])
+
+    def select_types(self, types=None, exclude_types=(), modifiers=True,
+                     specifiers=None):
+        """Keeps only the phrase triggers of the directive `types`
+
+        Types are the keywords written after "%!" (TODO, PLAN, QUESTION...),
+        matched against the patterns of `phrase_record_triggers`. MULT,
+        which continues any directive, is kept unless excluded and so are
+        the CUSTOM_TRIGGER modifiers if `modifiers`. The MULT lines
+        continuing a directive left out are left out. Only the variants of
+        the `specifiers` of `capture_specifiers` are kept if it is set. The
+        other phrase triggers are removed from the tables rather than
+        deactivated, each run of them is matched by a single regexp
+        recognising the directives left out, see `select_phrase_triggers`.
+        The custom phrase triggers of the document are selected in the same
+        way when they are added, a type can so name one of them, see
+        `unknown_types`.
+        """
+        types = None if types is None else [t.upper() for t in types]
+        exclude_types = [t.upper() for t in exclude_types]
+        self.type_selections.append(
+            (types, exclude_types, modifiers, specifiers))
+        if self._summary_tables is None:
+            return
+
+        # The tables may have changed since built, patterns are recognised
+        # by their regexp
+        keywords = {
+            pattern_name_to_re_string(pattern, capture_specifiers[spec]):
+            (pattern, spec) for pattern, spec in phrase_triggers(
+                phrase_record_triggers + self.custom_phrase_triggers)}
+        patterns = [pat_re.pattern for pat_re in self.summary_parse_re]
+        compiled = dict(zip(patterns, self.summary_parse_re))
+        re_strings, re_type = select_phrase_triggers(
+            patterns, self.summary_parse_re_types,
+            [keywords.get(pattern) for pattern in patterns],
+            self.keeps_phrase_trigger)
+        self.summary_parse_re = [
+            compiled[pattern] if pattern in compiled else re.compile(pattern)
+            for pattern in re_strings]
+        self.summary_parse_re_types = re_type
+
+    def unknown_types(self):
+        """Returns the types of the `select_types` matching no phrase trigger
+
+        Types are checked against `phrase_record_triggers` and the custom
+        phrase triggers added so far, so after the document is parsed.
+        """
+        patterns = phrase_record_triggers + self.custom_phrase_triggers
+        return [name for types, exclude_types, _, _ in self.type_selections
+                for name in (types or []) + exclude_types
+                if not any(re.fullmatch(pattern, name)
+                           for pattern in patterns)]
+
+    def keeps_phrase_trigger(self, pattern, specifier, re_type):
+        """True if the trigger of `pattern` is in the `select_types` made"""
+        for types, exclude_types, modifiers, specifiers in (
+                self.type_selections):
+            def named(names):
+                return any(re.fullmatch(pattern, name) for name in names)
+            if named(exclude_types) or (
+                    specifiers is not None and specifier not in specifiers):
+                return False
+            if types is None or named(types):
+                continue
+            if "modifier" in re_type and modifiers:
+                continue
+            if "multiline" not in re_type:
+                return False
+        return True
+
+    def add_line_record_triggers(self, new_commands, new_re_types=None):
+        re_type = self._match_re_and_type(
+            new_commands, new_re_types, default_command_type)
+
+        re_strings = [command_name_to_re_string(c) for c in new_commands]
+        # Lines get prepended to the list as they are at the start
+        self.summary_parse_re = (
+            build_regex_list(re_strings)
+            + self.summary_parse_re)
+        self.summary_parse_re_types = (
+            re_type + self.summary_parse_re_types)
+        self.summary_starts["pattern"] += len(new_commands)
+
+    def add_phrase_record_triggers(self, new_patterns, new_re_types=None):
+
+        re_type = self._match_re_and_type(
+            new_patterns, new_re_types, default_pattern_type)
+
+        re_strings = []
+        pat_range = range(0, 0 + len(new_patterns))
+        re_strings, re_type = apply_capture_specifiers(
+            new_patterns, re_type, pat_range,
+            re_strings, capture_specifiers)
+        self.custom_phrase_triggers.extend(new_patterns)
+        if self.type_selections:
+            re_strings, re_type = select_phrase_triggers(
+                re_strings, re_type, phrase_triggers(new_patterns),
+                self.keeps_phrase_trigger)
+
+        # phrases get appended as that enables to add as many as possible
+        self.summary_parse_re.extend(build_regex_list(re_strings))
+        self.summary_parse_re_types.extend(re_type)
+
+    def add_file_parse_triggers(self,
+                                new_file_triggers, new_trigger_modifs):
+        self.file_parse_re.extend(build_file_parse_re(new_file_triggers))
+        for i, new_trigger in enumerate(new_file_triggers):
+            self.file_parsing_modifiers[new_trigger] =\
+                new_trigger_modifs[i]
+
+    def _match_re_and_type(self, new_re_patterns, new_re_types, default_type):
+        """Checks that patterns and types are compatible"""
+        if new_re_types is None:
+            re_type = [dict(default_type) for _ in new_re_patterns]
+        else:
+            re_type = []
+            if len(new_re_patterns) != len(new_re_types):
+                raise IndexError(
+                    "pattern and type lists must be the same length;"
+                    + "\n if type definitions are not needed pass 'None'.")
+            else:
+                for new_type in new_re_types:
+                    if new_type is None:
+                        re_type.append(dict(default_type))
+                    else:
+                        re_type.append(new_type)
+        for d in re_type:
+            d["active"] = True
+            for df in default_type:
+                d[df] = default_type[df]
+        return re_type
+
+
+# Triggers of the module level functions, `parse_new_*` extend them. They
+# follow the changes of `file_parsing_modifiers` made by importing scripts.
+module_parseprops = ParsingProperties()
+module_parseprops.file_parsing_modifiers = file_parsing_modifiers
+
+
+class PathResolver(object):
+    """
+    Finds the files of input commands, caching what is read from the disk
+
+    Candidates are tried in this order:
+        1. the path as written, relative to the working directory or to
+         `base_directory`, the one LaTeX would run in;
+        2. relative to the directory of the including file and each of its
+         parents;
+        3. relative to each of `input_paths` (the equivalent of
+         `\graphicspath` or `\input@path` for the summary);
+        4. relative to each directory of the `TEXINPUTS` environment
+         variable, the subdirectories of the ones ending with `//` are
+         searched too.
+    The listing of a directory is read once and used for all its
+    candidates, resolved paths are kept for each directory of including
+    file. Names missing from the listings are checked on the disk before
+    giving up, for case insensitive file systems. The candidates of the
+    files which are not found are kept in `missing`. Relative `input_paths`
+    and `TEXINPUTS` directories are relative to `base_directory` too.
+    """
+    def __init__(self, input_paths=(), texinputs=None, base_directory=""):
+        super(PathResolver, self).__init__()
+        if texinputs is None:
+            texinputs = os.environ.get("TEXINPUTS", "")
+        self.input_paths = list(input_paths)
+        self.texinputs = texinputs
+        self.base_directory = base_directory
+        self.search_paths = None
+        self.reset()
+
+    def __getstate__(self):
+        # Listings are not sent to other processes, they are quick to redo
+        return {"input_paths": self.input_paths, "texinputs": self.texinputs,
+                "base_directory": self.base_directory}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def reset(self):
+        """Forgets what was read from the disk"""
+        self.listings = {}
+        self.resolved = {}
+        self.missing = set()
+        self.search_paths = None
+
+    def _search_paths(self):
+        if self.search_paths is None:
+            base = self.base_directory
+            self.search_paths = [os.path.join(base, path)
+                                 for path in self.input_paths]
+            for path in self.texinputs.split(os.pathsep):
+                if path.endswith("//"):
+                    root = os.path.join(base, path.rstrip("/") or "/")
+                    self.search_paths.extend(
+                        sorted(d for d, _, _ in os.walk(root)))
+                elif path:
+                    self.search_paths.append(os.path.join(base, path))
+        return self.search_paths
+
+    def _listing(self, directory):
+        if directory not in self.listings:
+            try:
+                self.listings[directory] = set(os.listdir(directory or "."))
+            except OSError:
+                self.listings[directory] = set()
+        return self.listings[directory]
+
+    def exists(self, path):
+        directory, name = os.path.split(path)
+        return name in self._listing(directory)
+
+    def candidates(self, next_file, current_file):
+        yield os.path.join(self.base_directory, next_file)
+        base_path = current_file
+        while base_path:
+            parent_path, _ = os.path.split(base_path)
+            if parent_path == base_path:
+                break
+            base_path = parent_path
+            yield os.path.join(base_path, next_file)
+        for path in self._search_paths():
+            yield os.path.join(path, next_file)
+
+    def resolve(self, next_file, current_file):
+        """Returns the path of `next_file` or None if it is not found"""
+        key = (next_file, os.path.dirname(current_file))
+        if key not in self.resolved:
+            candidates = list(self.candidates(next_file, current_file))
+            found = [c for c in candidates if self.exists(c)] or\
+                [c for c in candidates if os.path.exists(c)]
+            self.resolved[key] = found[0] if found else None
+            if not found:
+                self.missing.update(candidates)
+        return self.resolved[key]
+
+
+module_resolver = PathResolver()
+
+
+def parse_new_pattern(pattern, regex_type=default_pattern_type):
+    module_parseprops.summary_parse_re.append(
+        re.compile(pattern_name_to_re_string(pattern)))
+    module_parseprops.summary_parse_re_types.append(dict(regex_type))
+
+
+def parse_new_command(command, regex_type=default_command_type):
+    module_parseprops.summary_parse_re.append(
+        re.compile(command_name_to_re_string(command)))
+    module_parseprops.summary_parse_re_types.append(dict(regex_type))
+
+
+def parse_new_file(new_file_triggers):
+    module_parseprops.file_parse_re.extend(
+        build_file_parse_re(new_file_triggers))
+
+
+class Record(object):
+    """
+    A line of the summary, turned into LaTeX by `str()`
+
+    `kind` is one of:
+        - "comment": `text` is written as is and is not part of the document;
+        - "location": comment giving the file `text` and the line `ref` of
+         the record before it, only formatted when written;
+        - "label": label of the section number `ref`;
+        - "line", "section": a command copied from the document, "section"
+         for the ones with the "section" type;
+        - "item", "text": a captured record as an item or as plain text,
+         coloured with `color` and followed by a reference to the section
+         number `ref` if they are set;
+        - "start", "end": `text` opens or closes an item list.
+    """
+    __slots__ = ("kind", "text", "color", "ref")
+
+    def __init__(self, kind, text="", color=None, ref=None):
+        self.kind = kind
+        self.text = text
+        self.color = color
+        self.ref = ref
+
+    def __str__(self):
+        if self.kind == "location":
+            return location_format.format(self.text, self.ref)
+        if self.kind == "label":
+            return label_format.format(self.ref)
+        text = self.text
+        if self.color is not None:
+            text = color_format.format(self.color, text)
+        if self.ref is not None:
+            text += " (section~{0})".format(ref_format.format(self.ref))
+        if self.kind == "item":
+            text = item_str + text
+        return text
+
+
+class RecordList(list):
+    """
+    List of `Record` which keeps track of the item list being written
+
+    The state used by `open_itemlist` and `close_itemlist` is updated on
+    `append` so that they do not need to look back through the records:
+        - `last_open`: kind of the last "item", "start", "end" or line;
+        - `last_close`: kind of the last "item", "start" or line, with
+         `text_after` set if "text" or "end" records were added after it;
+        - the position of the last "start" and the state before it, to
+         remove a list which stayed empty.
+    Comments and labels do not change the state. Plain strings, the records
+    of the earlier versions, are accepted too, see `record_kind`.
+    """
+    def __init__(self, records=()):
+        super(RecordList, self).__init__()
+        self.last_kind = None
+        self.last_open = None
+        self.last_close = None
+        self.text_after = False
+        self.start_index = None
+        self.start_after_section = False
+        self.before_start = None
+        for record in records:
+            self.append(record)
+
+    def append(self, record):
+        if isinstance(record, Record):
+            kind = record.kind
+        else:
+            kind = record_kind(record)
+        if kind == "start":
+            self.start_index = len(self)
+            self.start_after_section = self.last_kind == "section"
+            self.before_start = (self.last_open, self.last_close,
+                                 self.text_after)
+        if kind in ("item", "start", "end", "line", "section"):
+            self.last_open = kind
+        if kind in ("item", "start", "line", "section"):
+            self.last_close = kind
+            self.text_after = False
+        elif kind in ("text", "end"):
+            self.text_after = True
+        self.last_kind = kind
+        super(RecordList, self).append(record)
+
+    def pop_start(self):
+        """Removes the last "start", only followed by comments and text"""
+        self.pop(self.start_index)
+        text_after = self.text_after
+        self.last_open, self.last_close, self.text_after = self.before_start
+        self.text_after = self.text_after or text_after
+
+
+class RecordStream(RecordList):
+    """
+    `RecordList` writing its records to a temporary file as it grows
+
+    Only the records which can still change, from an item list start with no
+    item yet, and up to `buffer_size` others are kept in memory.
+    `write_to` copies all the records to the output file.
+    """
+    def __init__(self, buffer_size=1024):
+        super(RecordStream, self).__init__()
+        import tempfile
+        self.buffer_size = buffer_size
+        self.spool = tempfile.TemporaryFile('w+', encoding="utf-8")
+
+    def append(self, record):
+        super(RecordStream, self).append(record)
+        if len(self) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        n_written = len(self)
+        if self.last_close == "start":
+            n_written = self.start_index
+        self.spool.writelines("%s\n" % l for l in self[:n_written])
+        del self[:n_written]
+        if self.start_index is not None:
+            self.start_index -= n_written
+
+    def write_to(self, f):
+        import shutil
+        self.spool.writelines("%s\n" % l for l in self)
+        del self[:]
+        self.spool.seek(0)
+        shutil.copyfileobj(self.spool, f)
+        self.spool.close()
+
+
+def record_kind(line):
+    """Returns the `Record` kind of a record given as a string"""
+    if re_comment.match(line):
+        return "comment"
+    if line.startswith(r"\label"):
+        return "label"
+    if line in (start_item, start_enum):
+        return "start"
+    if line in (end_item, end_enum):
+        return "end"
+    if item_str in line:
+        return "item"
+    record_type = detect_record(line)[0]
+    if record_is("section", record_type):
+        return "section"
+    if "line" in record_type:
+        return "line"
+    return "text"
+
+
+def new_records(stream=False):
+    """Returns empty records, the summary is a `RecordStream` if `stream`"""
+    return OrderedDict(
+        [('title', []), ('parser', []), ('legend', RecordList()),
+         ('todos', RecordList()),
+         ('summary', RecordStream() if stream else RecordList()),
+         ('files', [])],
+    )
+
+
+def new_record(records, kind, text):
+    # Plain lists get strings, as with the earlier versions
+    if isinstance(records, RecordList):
+        return Record(kind, text)
+    return text
+
+
+def open_itemlist(records, start_item, end_item, item_str):
+    # Opens a list unless the last item, start of list, line or end of list
+    # is an item or a start. The state of a plain list is rebuilt.
+    state = records if isinstance(records, RecordList) else\
+        RecordList(records)
+    if state.last_open not in ("item", "start"):
+        records.append(new_record(records, "start", start_item))
+
+
+def close_itemlist(records, start_item, end_item, item_str):
+    # Closes the list if it has items, removes it if it is empty. Sections
+    # without text get a spacing as the summary would otherwise be cramped.
+    state = records if isinstance(records, RecordList) else\
+        RecordList(records)
+    add_spacing = False
+    if state.last_close == "item":
+        records.append(new_record(records, "end", end_item))
+    elif state.last_close == "start":
+        add_spacing = state.start_after_section and not state.text_after
+        if state is records:
+            records.pop_start()
+        else:
+            records.pop(state.start_index)
+    elif state.last_close == "section":
+        add_spacing = not state.text_after
+
+    if add_spacing:
+        records.append(new_record(records, "text", section_spacing))
+
+
+parser_summary_str = r"\item \textbf{{{0}s}}: {1} were detected."
+parser_summary_done_str = r"\item \textbf{{{0}s}}: {1}({2}) were detected"\
+    + " (completed)."
+
+
+def summarise_parser_activity(records, counters):
+
+    records.append(r"\section{Parser results}")
+    records.append(start_item)
+    for count in counters:
+        if ((done_marker not in count
+                and (count + done_marker) not in counters)):
+            records.append(parser_summary_str.format(count, counters[count]))
+        elif (count[-len(done_marker):] == done_marker
+                and count[:-len(done_marker)] not in counters):
+            records.append(parser_summary_done_str.format(
+                count[:-len(done_marker)],
+                0,
+                counters[count]))
+        elif (count + done_marker) in counters:
+            records.append(parser_summary_done_str.format(
+                count,
+                counters[count],
+                counters[count + done_marker]))
+
+    records.append(end_item)
+
+
+class ParseCache(object):
+    """
+    Directory of the lines of interest of already parsed files
+
+    For each file the cache stores the lines where a pattern of
+    `summary_parse_re` matched (index of the pattern and captured text) and
+    the lines which include another file. Replaying these lines through
+    `process_record` rebuilds the records and counters of the file without
+    reading it, so that the output is the same as if the file had been
+    parsed: numbering, lists and the legend depend on what came before the
+    file and cannot be stored.
+
+    Entries are keyed on the content of the file and on the fingerprint of
+    the triggers active when the file is opened; `CUSTOM_TRIGGER_*`
+    modifiers met earlier in the document therefore lead to a different
+    entry. The fingerprint after each included file is stored too, if an
+    included file changes the triggers the rest of the file is read again.
+    Once the directory grows over `max_size` bytes the least recently used
+    entries are deleted.
+    """
+    version = 3
+
+    def __init__(self, directory, max_size=default_cache_size):
+        super(ParseCache, self).__init__()
+        self.directory = directory
+        self.max_size = max_size
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, file_in, do_process_record, fingerprint):
+        digest = hashlib.sha256()
+        with open(file_in, 'rb') as f:
+            digest.update(f.read())
+        digest.update(repr((
+            self.version,
+            do_process_record,
+            tuple(file_encodings),
+            fingerprint,
+        )).encode())
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".json")
+
+    def load(self, key):
+        import json
+        try:
+            with open(self._path(key), 'r', encoding="utf-8") as f:
+                entry = json.load(f)
+            os.utime(self._path(key))  # Marks the entry as recently used
+        except (OSError, ValueError):  # Missing, or evicted by another process
+            return None
+        return entry
+
+    def store(self, key, entry):
+        import json
+        import tempfile
+        # A temporary file of its own, other processes may store the same key
+        handle, temp_path = tempfile.mkstemp(
+            suffix=".tmp", dir=self.directory)
+        try:
+            with os.fdopen(handle, 'w', encoding="utf-8") as f:
+                json.dump(entry, f)
+            os.replace(temp_path, self._path(key))
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+    def evict(self):
+        entries = []
+        total_size = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            try:
+                info = os.stat(os.path.join(self.directory, name))
+            except FileNotFoundError:  # Evicted by another process
+                continue
+            entries.append((info.st_mtime, info.st_size, name))
+            total_size += info.st_size
+
+        for _, size, name in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+            total_size -= size
+
+
+section_level_re = re.compile(r"\s*\\(chapter|(?:sub)*section)")
+
+
+def section_level(command):
+    """Returns the depth of a sectioning command, 0 for a chapter"""
+    m = section_level_re.match(command)
+    if m is None or m.group(1) == "chapter":
+        return 0
+    return m.group(1).count("sub") + 1
+
+
+class DocumentPart(object):
+    """
+    Part of a document a `Parser` writes the records of
+
+    The part is the file `only_file` with the files it includes, or the
+    first section whose command contains `only_section` up to the next
+    section of the same or a higher level. The lines before the part are
+    still parsed, or replayed from the cache, so that sections keep the
+    numbers they have in the whole document, but their records go to the
+    `skipped` records. The rest of the document is not read once the part is
+    over.
+    """
+    def __init__(self, only_file=None, only_section=None):
+        super(DocumentPart, self).__init__()
+        self.only_file = only_file and os.path.realpath(only_file)
+        self.only_section = only_section
+        self.state = "before"  # then "in" and "after"
+        self.level = None  # of the section of `only_section`
+        self.records = None  # of the parser
+        self.skipped = None
+        self.counters = None  # when the part starts
+        self.counts = None  # of the records of the part, once it is over
+        self.legend = None  # counts already in the legend of the part
+
+    def __str__(self):
+        return self.only_file or self.only_section
+
+    def counted(self, counters):
+        """Returns the counts of the records of the part"""
+        if self.counts is not None:
+            return self.counts
+        return OrderedDict(
+            (count, n - self.counters.get(count, 0))
+            for count, n in counters.items()
+            if count == "section" or n > self.counters.get(count, 0))
+
+
+class Parser(object):
+    """
+    Parses a document into a set of records
+
+    A parser owns everything a parse modifies: the triggers `parseprops`,
+    which `CUSTOM_TRIGGER_*` modifiers extend, the `resolver` of input paths
+    and its listings, the `records` and the `counters`. Parsers sharing none
+    of these can run at the same time in different threads, `Summarizer`
+    builds a new one for each document.
+
+    Args:
+        parseprops (ParsingProperties): Triggers, modified along the parse.
+        resolver (PathResolver): Finds the files of input commands.
+        records (dict): Output of `new_records`.
+        counters (OrderedDict): Counts of each type of record.
+        do_process_record (bool): If False only input commands are followed.
+        generate_file_list (bool): Records the visited files in "files".
+        cache (ParseCache): Lines of interest of the files already parsed.
+        defer_includes (list): If set, included files are not parsed but
+            appended to it with a copy of the triggers at the input command.
+        verbose (bool): Prints the files and the modifiers met.
+        directives (list): If set, the directives met are appended to it as
+            [file, line, type, text, done, color, section, chapter,
+            section_number] rows: the enclosing section command, the number
+            of chapters met (0 before the first) and the number of the label
+            of the section in the summary.
+        locations (bool): Follows each record with a comment giving its file
+            and line.
+        part (DocumentPart): If set, only the records of that part of the
+            document are kept.
+        visited (list): If set, the files read, or replayed from the cache,
+            are appended to it.
+        shared_parseprops (bool): `parseprops` is shared with other parsers,
+            it is copied before the first modifier changes it, see
+            `own_parseprops`.
+    """
+    # Lines which can match a trigger: the line and file triggers start with
+    # a backslash, after whitespace, and the phrase triggers with "%!".
+    candidate_markers = ["\\", "%!"]
+    list_formats = {
+        "summary": (start_item, end_item),
+        "todos": (start_enum, end_enum),
+        "legend": (start_enum, end_enum),
+    }
+
+    def __init__(self, parseprops, resolver, records=None, counters=None,
+                 do_process_record=True, generate_file_list=False,
+                 cache=None, defer_includes=None, verbose=True,
+                 directives=None, locations=True, part=None, visited=None,
+                 shared_parseprops=False):
+        super(Parser, self).__init__()
+        self.parseprops = parseprops
+        self.shared_parseprops = shared_parseprops
+        self.resolver = resolver
+        if records is None:
+            records = new_records()
+        for name in self.list_formats:  # plain lists of the earlier versions
+            if not isinstance(records[name], RecordList):
+                records[name] = RecordList(records[name])
+        self.records = records
+        if counters is None:
+            counters = OrderedDict([("section", 0)])
+        self.counters = counters
+        self.do_process_record = do_process_record
+        self.generate_file_list = generate_file_list
+        self.cache = cache
+        self.defer_includes = defer_includes
+        self.verbose = verbose
+        self.prev_records = []  # previous record of each file being parsed
+        # summary records each open file started in, which it ends in
+        self.file_summaries = []
+        self.directives = directives
+        self.locations = locations  # writes where each record comes from
+        self.section = None  # last section met, for the directives
+        self.chapter = 0
+        self.section_number = None
+        self.parsed = {}  # entries of the files parsed, see `parse_file`
+        self.opened = set()  # keys of the files opened, see `_open_file`
+        self.part = part
+        self.visited = visited
+
+    def log(self, *args):
+        if self.verbose:
+            print(*args)
+
+    def open_itemlist(self, name):
+        start, end = self.list_formats[name]
+        open_itemlist(self.records[name], start, end, item_str)
+
+    def close_itemlist(self, name):
+        start, end = self.list_formats[name]
+        close_itemlist(self.records[name], start, end, item_str)
+
+    def scan_lines(self, file_in, first_line=0, text=None):
+        """Yields the lines of `file_in` which can match a trigger
+
+        The file is read at once and only the lines which can match are cut
+        out of it: the ones starting with a backslash, after whitespace, and
+        the ones containing "%!". They are found with `str.find`, which is
+        much faster than a regexp or a loop over the lines in python. Runs of
+        other lines are yielded as a single empty line as they only reset
+        the previous record. Every line is yielded if a trigger does not
+        have one of these shapes.
+
+        The file is searched as bytes and only the lines cut out of it are
+        decoded, with a `FileDecoder`. `text` is the content of the file if
+        it was already read.
+        """
+        if text is None:
+            text = read_bytes(file_in)
+        decoder = FileDecoder()
+        next_line = 0  # first line not yielded yet and its offset
+        next_start = 0
+        while next_line < first_line and next_start < len(text):
+            next_start = text.find(b"\n", next_start) + 1 or len(text)
+            next_line += 1
+
+        if not self.parseprops.candidate_lines_only(self.do_process_record):
+            yield from self.scan_every_line(
+                decoder.decode(text[next_start:]), 0, next_line)
+            return
+
+        markers = [marker.encode() for marker in self.candidate_markers]
+        if not self.do_process_record:
+            markers = markers[:1]
+        found = [text.find(marker, next_start) for marker in markers]
+        pos = next_start  # start of the line searched
+        while True:
+            for i, marker in enumerate(markers):
+                if 0 <= found[i] < pos:
+                    found[i] = text.find(marker, pos)
+            hits = [hit for hit in found if hit >= 0]
+            if not hits:
+                break
+            start = min(hits)
+            line_start = text.rfind(b"\n", pos, start) + 1 or pos
+            line_end = text.find(b"\n", start)
+            if line_end < 0:
+                line_end = len(text)
+            pos = line_end + 1
+            text_line = decoder.decode(text[line_start:line_end])
+            if not (text_line.lstrip().startswith("\\")
+                    or (self.do_process_record and "%!" in text_line)):
+                continue
+
+            line_num = next_line + text.count(b"\n", next_start, line_start)
+            if line_num > next_line:
+                yield next_line, "", (None, None), 1
+            # As reading the file line by line, see `scan_every_line`
+            line = text_line.splitlines()[0]
+            match = None
+            if self.do_process_record:
+                match = self.match_record(line)
+            n_lines = 1
+            if "{" in line:
+                line, match, n_lines, pos = self.command_line(
+                    line, match, text, min(pos, len(text)), decoder.decode)
+            yield line_num, line, match, n_lines
+            next_line = line_num + n_lines
+            next_start = pos
+
+            if not self.parseprops.candidate_lines_only(
+                    self.do_process_record):
+                # A modifier added a trigger of another shape
+                yield from self.scan_every_line(
+                    decoder.decode(text[next_start:]), 0, next_line)
+                return
+
+        if next_start < len(text):
+            n_lines = text.count(b"\n", next_start)
+            if not text.endswith(b"\n"):
+                n_lines += 1
+            yield next_line, "", (None, None), n_lines
+
+    def scan_every_line(self, text, start=0, first_line=0):
+        """Yields the lines of `text` from the offset `start`"""
+        lines_in = enumerate(io.StringIO(text[start:]), first_line)
+        pos = start
+        for line_num, lines in lines_in:
+            pos += len(lines)
+            line = lines.splitlines()[0]
+            match = None
+            if self.do_process_record:
+                match = self.match_record(line)
+            n_lines = 1
+            if "{" in line:
+                line, match, n_lines, pos = self.command_line(
+                    line, match, text, pos)
+                for _ in range(n_lines - 1):
+                    next(lines_in)
+            yield line_num, line, match, n_lines
+
+    def command_line(self, line, match, text, pos, decode=None):
+        """Joins the command of `line` to the next lines of `text` it spans
+
+        Only the commands of the line triggers and of the file triggers are
+        joined, see `join_command`, `pos` is the offset of the next line.
+
+        Returns:
+            (str, tuple, int, int): The line, its match, the number of lines
+            it spans and the offset of the line after them.
+        """
+        if "%!" in line or line.count("{") <= line.count("}") and (
+                "%" not in line):
+            return line, match, 1, pos
+        if self.do_process_record and match is None:
+            match = self.match_record(line)
+        if not (self.parseprops.file_command_re().match(line) or (
+                match and match[0] is not None
+                and match[1] == line.lstrip())):
+            return line, match, 1, pos
+        joined, n_lines, pos = join_command(
+            line, text, pos, decode=decode)
+        if n_lines and self.do_process_record:
+            match = self.match_record(joined)
+        return joined, match, n_lines + 1, pos
+
+    def replay_lines(self, entry, file_in):
+        """Yields the lines stored in a `ParseCache` entry
+
+        Runs of lines without a record are replayed as a single empty line as
+        they only reset the previous record.
+        """
+        next_line = 0
+        for (line_num, n_lines, index, captured, include,
+             fingerprint) in entry["events"]:
+            if line_num > next_line:
+                yield next_line, "", (None, None), 1
+            yield line_num, include or "", (index, captured), n_lines
+            next_line = line_num + n_lines
+            if (include is not None
+                    and fingerprint != self.parseprops.trigger_fingerprint(
+                        self.do_process_record)):
+                # The included file changed the triggers, the stored matches
+                # of the rest of the file cannot be trusted.
+                yield from self.scan_lines(file_in, next_line)
+                return
+        if entry["n_lines"] > next_line:
+            yield next_line, "", (None, None), entry["n_lines"] - next_line
+
+    def start_file(self, file_in, n_stacks=0, file_triggers=None):
+        """Starts the records of a file, `n_stacks` is its include depth"""
+        records = self.records
+        records['summary'].append(
+            Record("comment", "% Start file : " + file_in))
+        self.file_summaries.append(records['summary'])
+        self.prev_records.append({})
+        if n_stacks == 0:
+            records['todos'].append(
+                Record("section", r"\section{List of To-dos and questions}"))
+            records['todos'].append(Record("start", start_enum))
+            records['legend'].append(
+                Record("section", r"\section{Key of colours and item types}"))
+            records['legend'].append(Record("start", start_enum))
+        if self.generate_file_list and (
+                self.part is None or self.part.state == "in"):
+            records['files'].append(file_in)
+        if self.visited is not None:
+            self.visited.append(file_in)
+
+    def parse_line(self, file_in, line_num, line, match=None):
+        """Records a line of the file `file_in`
+
+        Returns:
+            (str, dict): The file included by the line, or None, and its
+            file triggers.
+        """
+        if self.do_process_record:
+            self.prev_records[-1] = self.process_record(
+                line, None, self.prev_records[-1], match,
+                (file_in, line_num + 1))
+        return self.detect_file(line, file_in)
+
+    def end_file(self, file_in, n_stacks=0):
+        self.prev_records.pop()
+        if n_stacks == 0:
+            self.close_itemlist('summary')
+            self.close_itemlist('todos')
+            self.close_itemlist('legend')
+            counters = self.counters
+            if self.part is not None and self.part.state != "before":
+                counters = self.part.counted(counters)
+            summarise_parser_activity(self.records['parser'], counters)
+        self.file_summaries.pop().append(
+            Record("comment", "% End file : " + file_in))
+
+    def parse_file(self, file_in, n_stacks=0, file_triggers=None):
+        """Parses `file_in` and the files it includes
+
+        Included files are parsed from an explicit stack of open files rather
+        than by recursion, so that long chains of includes do not reach the
+        recursion limit. A file included again with the same triggers is
+        replayed from the lines of interest of its second parse rather than
+        read again, its records are still written at every inclusion. The
+        lines of a file are only kept from its second inclusion on, most
+        files are only included once.
+
+        Raises:
+            ValueError: A file includes itself, directly or not, or the
+                `part` is not in the document.
+        """
+        if n_stacks == 0:
+            self.parsed = {}
+            self.opened = set()
+        part = self.part
+        if part is not None:
+            part.records = self.records
+            part.skipped = new_records()
+            part.skipped['title'] = self.records['title']  # of the document
+            part.legend = set()
+        stack = [self._open_file(file_in, n_stacks, file_triggers)]
+        while stack:
+            frame = stack[-1]
+            if part is not None and part.state == "after":
+                # The rest of the document is not read, nor stored
+                stack.pop()
+                frame["events"] = None
+                self._close_file(frame)
+                continue
+            if frame["include"] is not None:
+                # Back from the last included file
+                frame["include"] = None
+                if frame["events"] is not None:
+                    frame["events"][-1][5] = \
+                        self.parseprops.trigger_fingerprint(
+                            self.do_process_record)
+            for line_num, line, match, n_lines in frame["lines"]:
+                frame["n_lines"] = line_num + n_lines
+                next_file, next_file_triggers = self.parse_line(
+                    frame["file"], line_num, line, match)
+                if part is not None and part.state == "after":
+                    break
+                if frame["events"] is not None and (
+                        next_file or (match and match[0] is not None)):
+                    index, captured = match or (None, None)
+                    frame["events"].append([
+                        line_num, n_lines, index, captured,
+                        line if next_file else None, None])
+                if next_file and self.defer_includes is not None:
+                    self.defer_includes.append(
+                        (next_file, self.parseprops if self.shared_parseprops
+                         else copy.deepcopy(self.parseprops)))
+                elif next_file:
+                    self.log("Next file : " + next_file)
+                    check_include_cycle(stack, next_file)
+                    frame["include"] = next_file
+                    stack.append(self._open_file(
+                        next_file, frame["n_stacks"] + 1, next_file_triggers))
+                    break
+            else:
+                stack.pop()
+                self._close_file(frame)
+
+        if n_stacks == 0 and self.cache is not None:
+            self.cache.evict()
+        if part is not None:
+            if part.state == "before":
+                raise ValueError(
+                    "Part not found in the document : {0}".format(part))
+            self.records = part.records
+        return self.records, self.counters
+
+    def start_part(self):
+        """Writes the next records to the records of the parser"""
+        self.part.state = "in"
+        self.part.counters = OrderedDict(self.counters)
+        self.records = self.part.records
+
+    def end_part(self):
+        self.part.counts = self.part.counted(self.counters)
+        self.part.state = "after"
+        self.records = self.part.skipped
+
+    def check_section_part(self, record):
+        """Starts or ends the part of `only_section` at a section command"""
+        part = self.part
+        if part.state == "before" and part.only_section is not None and (
+                part.only_section in record):
+            part.level = section_level(record)
+            self.start_part()
+        elif part.state == "in" and part.level is not None and (
+                section_level(record) <= part.level):
+            self.end_part()
+
+    def _open_file(self, file_in, n_stacks, file_triggers):
+        """Starts a file of `parse_file`, returns its state on the stack
+
+        Lines come from the files already parsed in this run, then from the
+        `cache`, and are otherwise read from the file. The lines of interest
+        of a file which is read are recorded as "events" for the `cache`, or
+        if the file was already opened in this run.
+        """
+        frame = {"file": file_in, "n_stacks": n_stacks, "n_lines": 0,
+                 "real_path": os.path.realpath(file_in), "include": None,
+                 "cache_key": None, "events": None, "part": False}
+        part = self.part
+        if part is not None and part.state == "before" and (
+                part.only_file == frame["real_path"]):
+            frame["part"] = True
+            self.start_part()
+        self.start_file(file_in, n_stacks, file_triggers)
+        if n_stacks == 0 and part is not None and part.state == "before":
+            self.records = part.skipped
+        fingerprint = self.parseprops.trigger_fingerprint(
+            self.do_process_record)
+        frame["key"] = (frame["real_path"], fingerprint)
+        # The entry is only kept in `parsed` if the file is included again
+        frame["memoise"] = frame["key"] in self.opened
+        self.opened.add(frame["key"])
+        entry = self.parsed.get(frame["key"])
+        if entry is None and self.cache is not None:
+            frame["cache_key"] = self.cache.key(
+                file_in, self.do_process_record, fingerprint)
+            entry = self.cache.load(frame["cache_key"])
+            if entry is not None and frame["memoise"]:
+                self.parsed[frame["key"]] = entry
+
+        if entry is None:
+            if frame["memoise"] or frame["cache_key"] is not None:
+                frame["events"] = []
+            frame["lines"] = self.scan_lines(file_in)
+        else:
+            frame["lines"] = self.replay_lines(entry, file_in)
+        return frame
+
+    def _close_file(self, frame):
+        if frame["events"] is not None:
+            entry = {"events": frame["events"], "n_lines": frame["n_lines"]}
+            if frame["memoise"]:
+                self.parsed[frame["key"]] = entry
+            if frame["cache_key"] is not None:
+                self.cache.store(frame["cache_key"], entry)
+        if frame["n_stacks"] == 0 and self.part is not None:
+            self.records = self.part.records
+        self.end_file(frame["file"], frame["n_stacks"])
+        if frame["part"]:
+            self.end_part()
+
+    def detect_file(self, line, current_file):
+        next_file = None
+        next_file_triggers = None
+        if "\\" not in line:  # All file commands start with a backslash
+            return next_file, next_file_triggers
+
+        m = None
+        for file_re in self.parseprops.file_parse_re:
+            m = file_re["regexp"].search(line)
+            if m:
+                next_file_triggers = self.parseprops.file_parsing_modifiers[
+                    file_re["pattern"]]
+                break
+        if m:
+            next_file = ""
+            while m:
+                next_file += m.group(1).strip()
+                m = self.parseprops.file_capture_re.search(m.group(2))
+
+            if not os.path.splitext(next_file)[1]:
+                next_file += ".tex"
+
+            resolved_file = self.resolver.resolve(next_file, current_file)
+            if resolved_file is None:
+                raise IOError(
+                    "File input command detected but the file could not"
+                    " be found. \n line : '{0}'\n\n If the latex document "
+                    "compiles with this command report this error as an "
+                    "issue on github.".format(line))
+            next_file = resolved_file
+
+        return next_file, next_file_triggers
+
+    def match_record(self, line):
+        """Returns the index of the pattern matching `line` and its capture"""
+        index, m = self.parseprops.record_matcher().first_match(line)
+        if m:
+            return index, m.group(1)
+        return None, None
+
+    def detect_record(self, line, prev_record=None, match=None):
+        if match is None:
+            match = self.match_record(line)
+        index, captured = match
+        record_type = {}
+        record = line
+        # Without a match the type is the last one as in a scan of all
+        # patterns
+        pat_type = self.parseprops.summary_parse_re_types[
+            -1 if index is None else index]
+
+        # Check if the record is active or Not, if it is None, the activity
+        # depends on the previous record
+        if (prev_record is not None and "active" in prev_record and
+                "active" in pat_type and pat_type["active"] is None):
+            pat_type["active"] = prev_record["active"]
+
+        if index is not None and (
+                "active" not in pat_type or pat_type["active"]):
+            record = captured
+            record_type = pat_type
+
+        return record_type, record
+
+    def own_parseprops(self):
+        """Copies `parseprops` before a change if it is shared"""
+        if self.shared_parseprops:
+            self.parseprops = copy.deepcopy(self.parseprops)
+            self.shared_parseprops = False
+
+    def process_modifier(self, record_type, record):
+        self.own_parseprops()
+        modifier_call = getattr(
+            self.parseprops,
+            "add_" + record_type["modifier"])
+        new_partial_re, new_re_type = record_to_modifier_pattern(record)
+        self.log(new_partial_re)
+        self.log(new_re_type)
+        self.log(modifier_call)
+        modifier_call([new_partial_re], [new_re_type])
+        self.log("done.")
+
+    def index_record(self, record_type, record, prev_record, location):
+        """Adds the record to `directives` if it is one"""
+        if record_is("line", record_type):
+            if record_is("section", record_type):
+                self.section = record
+                self.section_number = self.counters["section"]
+                if record.lstrip().startswith("\\chapter"):
+                    self.chapter += 1
+        elif record_is("count", record_type):
+            self.directives.append(list(location) + [
+                record_type["count"], record,
+                bool(record_is("done", record_type)),
+                record_type.get("color"), self.section, self.chapter,
+                self.section_number])
+        elif (record_is("multiline", record_type)
+                and record_is("count", prev_record) and self.directives):
+            self.directives[-1][3] += " " + record
+
+    def location_record(self, line_info, location):
+        """Returns the comment giving where a record is in the document
+
+        `line_info` is the comment itself, if None it is formatted from the
+        (file, line) `location` when the records are written.
+        """
+        if line_info is not None:
+            return Record("comment", line_info)
+        return Record("location", location[0], ref=location[1])
+
+    def process_record(self, line, line_info, prev_record, match=None,
+                       location=None):
+        record_type, record = self.detect_record(line, prev_record, match)
+        if self.part is not None and record_is("section", record_type):
+            self.check_section_part(record)
+        records = self.records
+        nums = self.counters
+
+        # directives left out by `select_types` are matched to stop the
+        # directives after them on the line, they are not recorded and
+        # neither are the lines continuing them
+        if record_is("removed", record_type):
+            return record_type
+        if record_is("removed", prev_record) and \
+                record_is("multiline", record_type):
+            return prev_record
+
+        # modifiers alter the capturing regexp and are treated first, if one
+        # is encountered an early return is performed as the record should
+        # not be written.
+        if record_is("modifier", record_type):
+            self.process_modifier(record_type, record)
+            prev_record = record_type
+            return prev_record
+
+        if self.directives is not None and record_type:
+            self.index_record(record_type, record, prev_record, location)
+
+        if record_is("line", record_type):
+            self.close_itemlist('summary')
+
+        if record_is("prefix", record_type):
+            record = record_type["prefix"] + record
+        if record_is("suffix", record_type):
+            record = record + record_type["suffix"]
+        if record_is("done", record_type):
+            done_suffix = done_marker
+            if record_is("count", record_type):
+                done_suffix += " " + record_type["count"]
+            record = record + " [" + done_suffix + "]"
+
+        is_color, color = records_are_value("color", prev_record, record_type)
+        if not is_color:
+            color = None
+
+        kind = "text"
+        if record_is("item", record_type):
+            self.open_itemlist('summary')
+            kind = "item"
+        elif record_is("line", record_type):
+            kind = "section" if record_is("section", record_type) else "line"
+
+        if "title" in record_type:
+            record = str(Record(kind, record, color))
+            if record_type["title"]:
+                record = re.sub(r"\\title\s*\{",
+                                r"\\title{Summary of : ", record)
+            records["title"].append(record)
+            record_type = {}  # Stop it being recorded in the main text
+
+        if record_type and record_isnot("newline", record_type):
+            records['summary'].append(Record(kind, record, color))
+            if self.locations:
+                records['summary'].append(
+                    self.location_record(line_info, location))
+
+        if records_are("todo", prev_record, record_type):
+            todo_kind = kind
+            if not record_is("item", record_type) \
+                    and not record_is("multiline", record_type):
+                todo_kind = "item"
+
+            todo_ref = None
+            if record_is("todo", record_type):
+                todo_ref = nums["section"]
+            records['todos'].append(
+                Record(todo_kind, record, color, todo_ref))
+            if self.locations:
+                records['todos'].append(
+                    self.location_record(line_info, location))
+
+        if record_is("line", record_type):
+            records['summary'].append(Record("label", ref=nums["section"]))
+
+        if record_isnot("multiline", record_type):
+            prev_record = record_type
+        if record_is("count", record_type):
+            add_to_count_name = ""
+            if record_is("done", record_type):
+                add_to_count_name = done_marker
+            count_name = record_type["count"] + add_to_count_name
+            new_count = False
+            try:
+                nums[count_name] += 1
+            except Exception:  # start a new count if increment fails
+                nums[count_name] = 1
+                new_count = True
+            if self.part is not None:  # the legend of the records of the part
+                new_count = self.part.state == "in" and (
+                    count_name not in self.part.legend)
+                if new_count:
+                    self.part.legend.add(count_name)
+            if new_count and record_is("legend", record_type):
+                # add it to the legend
+                legend_str = count_name + " : " + record_type["legend"]
+                records["legend"].append(Record("item", legend_str, color))
+
+        return prev_record
+
+
+def module_parser(**parser_args):
+    """Returns a `Parser` on the module level triggers and resolver"""
+    return Parser(module_parseprops, module_resolver, **parser_args)
+
+
+def parse_file(
+    file_in,
+    records=None,
+    n_stacks=0,
+    counters=None,
+    do_process_record=True,
+    generate_file_list=False,
+    file_triggers=None,
+    cache=None,
+    defer_includes=None,
+):
+    parser = module_parser(
+        records=records, counters=counters,
+        do_process_record=do_process_record,
+        generate_file_list=generate_file_list,
+        cache=cache, defer_includes=defer_includes)
+    return parser.parse_file(file_in, n_stacks, file_triggers)
+
+
+def check_include_cycle(stack, next_file):
+    """Raises a ValueError if `next_file` is one of the files of `stack`
+
+    Args:
+        stack (list): The open files, dictionaries with the "file" and its
+            "real_path".
+    """
+    real_path = os.path.realpath(next_file)
+    for i, frame in enumerate(stack):
+        if frame["real_path"] == real_path:
+            raise ValueError("Include cycle : " + " -> ".join(
+                [f["file"] for f in stack[i:]] + [next_file]))
+
+
+def walk_file(file_in, parsers, n_stacks=0, file_triggers=None):
+    """Reads a document once for several parsers
+
+    Each file is read once and each parser goes through the bytes read with
+    its own `scan_lines`, so that it only meets the lines which can match
+    its triggers. The lines are given to `parse_line` in the order of the
+    file, parsers including the same file at the same line walk it together
+    and share the resolution of the input paths when they share a
+    `PathResolver`. A parser only moves on once the file it includes has
+    been walked, as the next lines are matched with the triggers the
+    included file leaves. Like `Parser.parse_file` included files are
+    walked from an explicit stack.
+
+    Args:
+        parsers (list): Objects with the `start_file`, `scan_lines`,
+            `parse_line` and `end_file` methods of `Parser`.
+
+    Raises:
+        ValueError: A file includes itself, directly or not.
+    """
+    stack = [open_walked_file(
+        file_in, [(parser, file_triggers) for parser in parsers], n_stacks)]
+    while stack:
+        frame = stack[-1]
+        if frame["includes"]:
+            next_file, included_by = frame["includes"].pop(0)
+            print("Next file : " + next_file)
+            check_include_cycle(stack, next_file)
+            stack.append(open_walked_file(
+                next_file, included_by, frame["n_stacks"] + 1))
+            continue
+        for i in frame["advance"]:
+            frame["next"][i] = next(frame["lines"][i], None)
+        frame["advance"] = []
+        line_nums = [item[0] for item in frame["next"] if item is not None]
+        if not line_nums:
+            stack.pop()
+            for parser, _ in frame["parsers"]:
+                parser.end_file(frame["file"], frame["n_stacks"])
+            continue
+
+        line_num = min(line_nums)
+        includes = OrderedDict()
+        for i, (parser, _) in enumerate(frame["parsers"]):
+            item = frame["next"][i]
+            if item is None or item[0] != line_num:
+                continue
+            _, line, match, _ = item
+            next_file, next_file_triggers = parser.parse_line(
+                frame["file"], line_num, line, match)
+            frame["advance"].append(i)
+            if next_file:
+                includes.setdefault(next_file, []).append(
+                    (parser, next_file_triggers))
+        frame["includes"] = list(includes.items())
+
+
+def open_walked_file(file_in, parsers, n_stacks):
+    """Starts a file of `walk_file` for the (parser, file triggers) given"""
+    for parser, file_triggers in parsers:
+        parser.start_file(file_in, n_stacks, file_triggers)
+    # Read at once, deep includes would otherwise keep many files open
+    text = read_bytes(file_in)
+    return {"file": file_in, "real_path": os.path.realpath(file_in),
+            "parsers": parsers, "n_stacks": n_stacks, "includes": None,
+            "lines": [parser.scan_lines(file_in, text=text)
+                      for parser, _ in parsers],
+            "next": [None] * len(parsers),
+            "advance": list(range(len(parsers)))}
+
+
+class MemoryCache(ParseCache):
+    """
+    `ParseCache` kept in memory between the runs of `watch`
+
+    Only the entries used by the last run are kept. The files visited by the
+    last run are available in `visited`.
+    """
+    def __init__(self):
+        self.entries = {}
+        self.keys = {}
+        self.signatures = {}
+        self.used = {}
+        self.visited = set()
+
+    def key(self, file_in, do_process_record, fingerprint):
+        # The file is only read again if its modification time or size
+        # changed since its key was computed
+        info = os.stat(file_in)
+        signature = (file_in, info.st_mtime_ns, info.st_size,
+                     do_process_record, fingerprint)
+        key = self.keys.get(signature)
+        if key is None:
+            key = super(MemoryCache, self).key(
+                file_in, do_process_record, fingerprint)
+            self.keys[signature] = key
+        self.used[key] = file_in
+        self.signatures[key] = signature
+        return key
+
+    def load(self, key):
+        return self.entries.get(key)
+
+    def store(self, key, entry):
+        self.entries[key] = entry
+
+    def evict(self):
+        self.entries = {key: self.entries[key] for key in self.used
+                        if key in self.entries}
+        self.signatures = {key: self.signatures[key] for key in self.used}
+        self.keys = {self.signatures[key]: key for key in self.used}
+        self.visited = set(self.used.values())
+        self.used = {}
+
+
+class PrescannedFiles(object):
+    """
+    Entries of `prescan_file` used in place of a `ParseCache`
+
+    Entries are looked up by file and fingerprint of the triggers, a file
+    read in a state which turns out not to be the one of the serial parse is
+    simply read again.
+    """
+    def __init__(self, entries):
+        super(PrescannedFiles, self).__init__()
+        self.entries = entries
+
+    def key(self, file_in, do_process_record, fingerprint):
+        return file_in, fingerprint
+
+    def load(self, key):
+        return self.entries.get(key)
+
+    def store(self, key, entry):
+        pass
+
+    def evict(self):
+        pass
+
+
+class RecordingCache(PrescannedFiles):
+    """Keeps the entry stored by `parse_file` for a single file"""
+    def __init__(self):
+        super(RecordingCache, self).__init__({})
+        self.entry = None
+
+    def store(self, key, entry):
+        self.entry = entry
+
+
+def prescan_file(file_in, parseprops, resolver, do_process_record):
+    """Reads a single file for `prescan_tree`
+
+    Run in a worker process: the triggers `parseprops` are the state
+    expected at the start of the file, and included files are not followed.
+    They are expected not to change the triggers, which is checked when the
+    entry is replayed.
+
+    Returns:
+        (dict, list): The `ParseCache` entry of the file and the list of
+        (file, triggers) of the included files.
+    """
+    recorder = RecordingCache()
+    includes = []
+    # Modifiers print the triggers they add, this is left to the serial parse
+    parser = Parser(parseprops, resolver,
+                    do_process_record=do_process_record, cache=recorder,
+                    defer_includes=includes, verbose=False)
+    parser.parse_file(file_in, 1)
+    return recorder.entry, includes
+
+
+def prescan_tree(file_in, jobs, parseprops, resolver, do_process_record=True):
+    """Reads all the files of a document in parallel
+
+    Files are submitted to a pool of `jobs` processes as they are discovered.
+    The triggers at the start of a file are the ones of its parent at the
+    include command, so a file included in different states is read once
+    per state.
+
+    Returns:
+        PrescannedFiles: to pass as the `cache` of `parse_file`. Files which
+        fail to be read are left out, the serial parse raises the error.
+    """
+    from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+    entries = {}
+    with ProcessPoolExecutor(jobs) as executor:
+        submitted = set()
+        pending = {}
+        to_submit = [(file_in, parseprops)]
+        while to_submit or pending:
+            for next_file, parseprops in to_submit:
+                key = (next_file,
+                       parseprops.trigger_fingerprint(do_process_record))
+                if key not in submitted:
+                    submitted.add(key)
+                    future = executor.submit(
+                        prescan_file, next_file, parseprops,
+                        resolver, do_process_record)
+                    pending[future] = key
+            to_submit = []
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                key = pending.pop(future)
+                if future.exception() is not None:
+                    continue
+                entries[key], includes = future.result()
+                to_submit.extend(includes)
+
+    return PrescannedFiles(entries)
+
+
+def detect_file(line, current_file):
+    return module_parser().detect_file(line, current_file)
+
+
+def match_record(line):
+    """Returns the index of the pattern matching `line` and its capture"""
+    return module_parser().match_record(line)
+
+
+def detect_record(line, prev_record=None, match=None):
+    return module_parser().detect_record(line, prev_record, match)
+
+
+def record_is(rec_str, record_type):
+    return rec_str in record_type and record_type[rec_str]
+
+
+def record_isnot(rec_str, record_type):
+    return rec_str not in record_type or not record_type[rec_str]
+
+
+def previous_record_is(rec_str, prev_record, record_type):
+    return record_is(rec_str, prev_record) and\
+        record_is("multiline", record_type)
+
+
+def records_are(rec_str, prev_record, curr_record):
+    return record_is(rec_str, curr_record) \
+        or previous_record_is(rec_str, prev_record, curr_record)
+
+
+def records_are_value(rec_str, prev_record, curr_record):
+    val = None
+    logical = records_are(rec_str, prev_record, curr_record)
+    if logical and record_is(rec_str, curr_record):
+        val = curr_record[rec_str]
+    elif logical:
+        val = prev_record[rec_str]
+
+    return logical, val
+
+
+def record_to_modifier_pattern(record):
+    delimiter = ";"
+    try:
+        new_partial_re, new_re_type_string = record.split(delimiter, 1)[:]
+    except ValueError:
+        new_partial_re = record
+        new_re_type_string = "None"
+
+    import ast
+    new_partial_re = new_partial_re.strip()
+    new_re_type = ast.literal_eval(new_re_type_string.strip())
+
+    return new_partial_re, new_re_type
+
+
+def process_modifier(record_type, record):
+    module_parser().process_modifier(record_type, record)
+
+
+def process_record(records, line, line_info, prev_record, nums, match=None):
+    parser = module_parser(records=records, counters=nums)
+    return parser.process_record(line, line_info, prev_record, match), nums
+
+
+@contextlib.contextmanager
+def replaced_file(file_name):
+    """Opens a temporary file which then replaces `file_name`
+
+    The replacement is atomic and only happens if the content changed, an
+    unchanged output keeps its modification time so that the builds
+    depending on it (latexmk, make) are skipped. The temporary file has a
+    name of its own in the same directory, so that runs writing the same
+    output at once do not mix their writes, and gets the permissions of
+    the file it replaces. Like all the outputs, it is written in UTF-8
+    whatever the encoding of the files read and of the locale.
+    """
+    flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0)
+    while True:
+        temp_name = "{0}.{1}.tmp".format(file_name, os.urandom(4).hex())
+        try:
+            handle = os.open(temp_name, flags, 0o666)  # mode of the umask
+            break
+        except FileExistsError:
+            continue
+    try:
+        with os.fdopen(handle, 'w', encoding="utf-8") as f:
+            yield f
+        import filecmp
+        if os.path.isfile(file_name) and filecmp.cmp(
+                temp_name, file_name, shallow=False):
+            os.remove(temp_name)
+        else:
+            if os.path.exists(file_name):
+                os.chmod(temp_name, stat.S_IMODE(os.stat(file_name).st_mode))
+            os.replace(temp_name, file_name)
+    except BaseException:
+        if os.path.exists(temp_name):
+            os.remove(temp_name)
+        raise
+
+
+def standard_output():
+    """Opens the standard output to write an output in UTF-8, see
+    `replaced_file`, it is left open when the file is closed"""
+    sys.stdout.flush()
+    return open(sys.stdout.fileno(), 'w', encoding="utf-8", closefd=False)
+
+
+def summary_file_name(file_name, name_change=default_name_change,
+                      new_ext=None):
+    """Returns the name of the output of `write_records` for `file_name`"""
+    if not name_change:
+        name_change = default_name_change
+
+    file, ext = os.path.splitext(file_name)
+    if new_ext is None:
+        new_ext = ext
+    return file + name_change + new_ext
+
+
+def write_records(
+        records, file_name, name_change=default_name_change, new_ext=None,
+        records_to_print=None, file_out=None):
+
+    new_file = summary_file_name(file_name, name_change, new_ext)
+    if file_out is not None:
+        new_file = file_out
+
+    if new_file == "-":
+        output = standard_output()
+    else:
+        output = replaced_file(new_file)
+    with output as f:
+        if records_to_print is None:
+            records_to_print = records
+        for rec in records_to_print:
+            if isinstance(records[rec], RecordStream):
+                records[rec].write_to(f)
+            else:
+                f.writelines("%s\n" % l for l in records[rec])
+            f.write("\n")
+
+
+class Profiler(object):
+    """
+    Measures where the time of a run goes
+
+    `install` replaces methods of a `Parser` by timed wrappers and its
+    `RecordMatcher` by a `ProfiledRecordMatcher`, parsers it is not
+    installed on are neither measured nor slowed down. Collected are:
+        - for each pattern of `summary_parse_re`: attempts, hits and time;
+        - for each file: its lines, the lines scanned (the ones which can
+         match a trigger, a run of other lines counts as one), time
+         including and excluding the included files;
+        - the time of the phases: include detection and path resolution,
+         opening and closing item lists and writing the records.
+    """
+    phase_methods = OrderedDict([
+        ("detect_file", "include detection"),
+        ("open_itemlist", "item lists"),
+        ("close_itemlist", "item lists"),
+    ])
+
+    def __init__(self):
+        super(Profiler, self).__init__()
+        self.patterns = OrderedDict()
+        self.files = OrderedDict()
+        self.phases = OrderedDict()
+        phases = ["total", "parsing", "record matching", "path resolution"]
+        for phase in phases + list(self.phase_methods.values()) + ["writing"]:
+            self.phases[phase] = 0.0
+        # [time spent in included files, start] of each file being parsed
+        self.nested = []
+        self.start = None
+
+    def timed(self, function, phase):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.phases[phase] += time.perf_counter() - start
+        return timed
+
+    def _timed_start_file(self, function):
+        def timed(file_in, *args, **kwargs):
+            self.files.setdefault(
+                file_in, {"lines": 0, "scanned": 0, "seconds": 0.0,
+                          "self_seconds": 0.0})
+            self.nested.append([0.0, time.perf_counter()])
+            return function(file_in, *args, **kwargs)
+        return timed
+
+    def _timed_end_file(self, function):
+        def timed(file_in, *args, **kwargs):
+            try:
+                return function(file_in, *args, **kwargs)
+            finally:
+                nested, start = self.nested.pop()
+                elapsed = time.perf_counter() - start
+                stats = self.files[file_in]
+                stats["seconds"] += elapsed
+                stats["self_seconds"] += elapsed - nested
+                if self.nested:
+                    self.nested[-1][0] += elapsed
+                else:
+                    self.phases["parsing"] += elapsed
+        return timed
+
+    def _counted_detect_file(self, function):
+        def counted(line, current_file):
+            self.files[current_file]["scanned"] += 1
+            return function(line, current_file)
+        return counted
+
+    def _counted_close_file(self, function):
+        def counted(frame):
+            self.files[frame["file"]]["lines"] += frame["n_lines"]
+            return function(frame)
+        return counted
+
+    def install(self, parser):
+        for name, phase in self.phase_methods.items():
+            setattr(parser, name, self.timed(getattr(parser, name), phase))
+        parser.detect_file = self._counted_detect_file(parser.detect_file)
+        parser.start_file = self._timed_start_file(parser.start_file)
+        parser.end_file = self._timed_end_file(parser.end_file)
+        parser._close_file = self._counted_close_file(parser._close_file)
+        parser.resolver.resolve = self.timed(
+            parser.resolver.resolve, "path resolution")
+        parser.own_parseprops()
+        parser.parseprops.matcher_class = \
+            lambda patterns: ProfiledRecordMatcher(patterns, self)
+        parser.parseprops.matcher = None
+
+    def start_run(self):
+        self.start = time.perf_counter()
+
+    def stop_run(self):
+        self.phases["total"] += time.perf_counter() - self.start
+        self.phases["record matching"] = sum(
+            stats[2] for stats in self.patterns.values())
+
+    def to_json(self):
+        return {
+            "phases": self.phases,
+            "files": self.files,
+            "patterns": [
+                {"pattern": pattern, "attempts": stats[0], "hits": stats[1],
+                 "seconds": stats[2]}
+                for pattern, stats in self.patterns.items()],
+        }
+
+    def print_report(self, max_pattern_len=48):
+        print("{0:<24}{1:>12}".format("Phase", "seconds"))
+        for phase, seconds in self.phases.items():
+            print("{0:<24}{1:>12.4f}".format(phase, seconds))
+
+        print("\n{0:<48}{1:>10}{2:>10}{3:>12}{4:>14}".format(
+            "File", "lines", "scanned", "seconds", "self seconds"))
+        for file_in, stats in self.files.items():
+            print("{0:<48}{1:>10}{2:>10}{3:>12.4f}{4:>14.4f}".format(
+                file_in, stats["lines"], stats["scanned"], stats["seconds"],
+                stats["self_seconds"]))
+
+        print("\n{0:<48}{1:>10}{2:>10}{3:>12}".format(
+            "Pattern", "attempts", "hits", "seconds"))
+        for pattern, stats in sorted(self.patterns.items(),
+                                     key=lambda x: -x[1][2]):
+            if len(pattern) > max_pattern_len:
+                pattern = pattern[:max_pattern_len - 3] + "..."
+            print("{0:<48}{1:>10}{2:>10}{3:>12.4f}".format(
+                pattern, *stats))
+
+
+class DirectiveIndex(object):
+    """
+    SQLite database of the directives of documents
+
+    Rows of the `directives` table are the directives collected by a
+    `Parser`: type (the "count" of the trigger), text, done flag, color,
+    file, line, enclosing section command, chapter and section numbers and
+    document (its main file). Updates are incremental: the rows of a file
+    are only rewritten if they changed, which is checked against a digest of
+    them stored in `files`. A database of an older `version` is rebuilt. For
+    example the open todos of the third chapter of every document:
+
+        SELECT document, file, line, text FROM directives
+        WHERE type = 'todo' AND NOT done AND chapter = 3
+    """
+    version = 1
+    schema = [
+        "CREATE TABLE IF NOT EXISTS directives (document TEXT, file TEXT,"
+        " line INTEGER, type TEXT, text TEXT, done INTEGER, color TEXT,"
+        " section TEXT, chapter INTEGER, section_number INTEGER)",
+        "CREATE TABLE IF NOT EXISTS files (document TEXT, file TEXT,"
+        " digest TEXT, PRIMARY KEY (document, file))",
+        "CREATE INDEX IF NOT EXISTS directives_type ON directives (type)",
+        "CREATE INDEX IF NOT EXISTS directives_file"
+        " ON directives (document, file)",
+        "CREATE INDEX IF NOT EXISTS directives_section"
+        " ON directives (section)",
+        "CREATE INDEX IF NOT EXISTS directives_chapter"
+        " ON directives (document, chapter, section_number)",
+    ]
+
+    def __init__(self, path):
+        import sqlite3
+        super(DirectiveIndex, self).__init__()
+        self.connection = sqlite3.connect(path)
+        with self.connection:
+            version, = self.connection.execute(
+                "PRAGMA user_version").fetchone()
+            if version < self.version:  # rebuilt by the next updates
+                self.connection.execute("DROP TABLE IF EXISTS directives")
+                self.connection.execute("DROP TABLE IF EXISTS files")
+                self.connection.execute(
+                    "PRAGMA user_version = {0}".format(self.version))
+            for statement in self.schema:
+                self.connection.execute(statement)
+
+    def close(self):
+        self.connection.close()
+
+    def update(self, document, directives):
+        """Stores the `directives` of a `Parser` as the ones of `document`
+
+        Returns:
+            list: The files whose rows were rewritten.
+        """
+        document = os.path.abspath(document)
+        rows = OrderedDict()
+        for directive in directives:
+            rows.setdefault(os.path.abspath(directive[0]), []).append(
+                [directive[1]] + directive[2:])
+        digests = {file_in: hashlib.sha256(
+            repr(file_rows).encode()).hexdigest()
+            for file_in, file_rows in rows.items()}
+
+        with self.connection:
+            stored = dict(self.connection.execute(
+                "SELECT file, digest FROM files WHERE document = ?",
+                (document,)))
+            changed = [file_in for file_in in rows
+                       if stored.get(file_in) != digests[file_in]]
+            removed = [file_in for file_in in stored if file_in not in rows]
+            for file_in in changed + removed:
+                self.connection.execute(
+                    "DELETE FROM directives WHERE document = ? AND file = ?",
+                    (document, file_in))
+                self.connection.execute(
+                    "DELETE FROM files WHERE document = ? AND file = ?",
+                    (document, file_in))
+            for file_in in changed:
+                self.connection.executemany(
+                    "INSERT INTO directives"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [[document, file_in] + row for row in rows[file_in]])
+                self.connection.execute(
+                    "INSERT INTO files VALUES (?, ?, ?)",
+                    (document, file_in, digests[file_in]))
+        return changed + removed
+
+
+# Fields of the directives collected by `Parser`, in their order
+directive_fields = ["file", "line", "type", "text", "done", "color", "section",
+                    "chapter", "section_number"]
+
+# Kinds of change of `diff_directives`, in the order they are written
+diff_kinds = OrderedDict([
+    ("added", "Added"),
+    ("completed", "Completed"),
+    ("reopened", "Reopened"),
+    ("modified", "Modified"),
+    ("removed", "Removed"),
+])
+
+
+def diff_directives(old, new, threshold=0.6):
+    """Matches the directives of two revisions of a document
+
+    Directives of the same type are matched on their text in the same
+    section, then on their text in any section and finally on the
+    similarity of their texts, at least `threshold` (see
+    `difflib.SequenceMatcher.ratio`), the ones of the same section first.
+
+    Args:
+        old (list): Directives of the old revision, see `Parser`.
+        new (list): Directives of the new revision.
+
+    Returns:
+        OrderedDict: For each kind of `diff_kinds` the list of changes, the
+        directives as dictionaries of `directive_fields`, for "completed",
+        "reopened" and "modified" the {"old", "new", "similarity"} of the
+        matched directives. "unchanged" is the number of other matches.
+    """
+    import difflib
+    old = [dict(zip(directive_fields, directive)) for directive in old]
+    new = [dict(zip(directive_fields, directive)) for directive in new]
+    matches = {}  # index in new: (index in old, similarity)
+
+    for key_fields in (("type", "section", "text"), ("type", "text")):
+        unmatched = OrderedDict()
+        matched_old = {i for i, _ in matches.values()}
+        for i, directive in enumerate(old):
+            if i not in matched_old:
+                key = tuple(directive[field] for field in key_fields)
+                unmatched.setdefault(key, []).append(i)
+        for j, directive in enumerate(new):
+            key = tuple(directive[field] for field in key_fields)
+            if j not in matches and unmatched.get(key):
+                matches[j] = (unmatched[key].pop(0), 1.0)
+
+    matched_old = {i for i, _ in matches.values()}
+    candidates = []
+    for j, new_directive in enumerate(new):
+        if j in matches:
+            continue
+        for i, old_directive in enumerate(old):
+            if (i in matched_old
+                    or old_directive["type"] != new_directive["type"]):
+                continue
+            matcher = difflib.SequenceMatcher(
+                None, old_directive["text"], new_directive["text"])
+            if matcher.quick_ratio() < threshold:
+                continue
+            ratio = matcher.ratio()
+            if ratio >= threshold:
+                same_section = \
+                    old_directive["section"] == new_directive["section"]
+                candidates.append((same_section, ratio, -j, -i))
+    for _, ratio, j, i in sorted(candidates, reverse=True):
+        if -j not in matches and -i not in matched_old:
+            matches[-j] = (-i, ratio)
+            matched_old.add(-i)
+
+    delta = OrderedDict((kind, []) for kind in diff_kinds)
+    delta["unchanged"] = 0
+    for j, new_directive in enumerate(new):
+        if j not in matches:
+            delta["added"].append(new_directive)
+            continue
+        i, ratio = matches[j]
+        old_directive = old[i]
+        change = OrderedDict([("old", old_directive), ("new", new_directive),
+                              ("similarity", ratio)])
+        if new_directive["done"] and not old_directive["done"]:
+            delta["completed"].append(change)
+        elif old_directive["done"] and not new_directive["done"]:
+            delta["reopened"].append(change)
+        elif (old_directive["text"] != new_directive["text"]
+                or old_directive["section"] != new_directive["section"]):
+            delta["modified"].append(change)
+        else:
+            delta["unchanged"] += 1
+    matched_old = {i for i, _ in matches.values()}
+    delta["removed"] = [directive for i, directive in enumerate(old)
+                        if i not in matched_old]
+    return delta
+
+
+def format_directive(directive):
+    """Returns the item and location comment of a directive of a diff"""
+    text = directive["text"]
+    if directive["color"]:
+        text = color_format.format(directive["color"], text)
+    return [item_str + text, location_format.format(
+        directive["file"], directive["line"])]
+
+
+def write_dependencies(target, files, file_name=None):
+    """Writes a Make dependency file: `target` depends on the `files`
+
+    Each file also gets a rule without recipe, as from `gcc -MP`, so that
+    make does not fail once one of them is deleted.
+
+    Args:
+        file_name (str): Defaults to `target` with the ".d" extension.
+    Returns:
+        str: The name of the dependency file.
+    """
+    if file_name is None:
+        file_name = os.path.splitext(target)[0] + ".d"
+    files = list(OrderedDict.fromkeys(files))
+
+    def escape(name):
+        return name.replace(" ", "\\ ").replace("$", "$$")
+    with replaced_file(file_name) as f:
+        f.write(escape(target) + ":")
+        f.writelines(" \\\n " + escape(name) for name in files)
+        f.write("\n")
+        f.writelines("\n{0}:\n".format(escape(name)) for name in files)
+    return file_name
+
+
+def write_diff(delta, file_name, name_change="_auto_diff"):
+    """Writes `delta` as a LaTeX section and as JSON next to `file_name`
+
+    Returns:
+        (str, str): The names of the LaTeX and JSON files.
+    """
+    lines = [r"\section{Changes of the directives}"]
+    for kind, title in diff_kinds.items():
+        if not delta[kind]:
+            continue
+        lines.append(r"\subsection{{{0} ({1})}}".format(
+            title, len(delta[kind])))
+        lines.append(start_item)
+        for change in delta[kind]:
+            if kind in ("added", "removed"):
+                lines.extend(format_directive(change))
+                continue
+            lines.extend(format_directive(change["new"]))
+            if change["old"]["text"] != change["new"]["text"]:
+                lines.append("            (was: {0})".format(
+                    change["old"]["text"]))
+            if change["old"]["section"] != change["new"]["section"]:
+                lines.append("            (moved from: {0})".format(
+                    change["old"]["section"]))
+        lines.append(end_item)
+
+    file, ext = os.path.splitext(file_name)
+    tex_name = file + name_change + ext
+    json_name = file + name_change + ".json"
+    with replaced_file(tex_name) as f:
+        f.writelines("%s\n" % l for l in lines)
+    import json
+    with replaced_file(json_name) as f:
+        json.dump(delta, f, indent=2)
+    return tex_name, json_name
+
+
+def diff_documents(summarizer, old_file, new_file):
+    """Returns the `diff_directives` of two revisions of a document
+
+    Both revisions are parsed with the same `MemoryCache`, the files of the
+    new revision identical to a file of the old one are replayed from it
+    rather than parsed again. The input commands of each revision are
+    resolved from the directory of its main file, as LaTeX is run, so that
+    they find the files of its own tree. The files of the directives are
+    relative to that directory.
+    """
+    cache = MemoryCache()
+    old, new = [], []
+    for file_name, directives in ((old_file, old), (new_file, new)):
+        directory = os.path.dirname(file_name)
+        summarizer.parse(file_name, cache, directives,
+                         resolver=summarizer.new_resolver(directory))
+        for directive in directives:
+            directive[0] = os.path.relpath(directive[0], directory or ".")
+    return diff_directives(old, new)
+
+
+class Summarizer(object):
+    """
+    Builds the summary of LaTeX documents
+
+    The triggers the summarizer starts from are never modified: each
+    document is parsed by a new `Parser` working on a copy of them, with its
+    own path resolver, records and counters. A summarizer can therefore be
+    reused and shared between threads:
+
+        summarizer = Summarizer(summary_only=True, verbose=False)
+        records, counters = summarizer.parse("main.tex")
+        summarizer.write(records, "main.tex")
+
+    Args:
+        parseprops (ParsingProperties): Triggers to start from, copied.
+            Defaults to a new `ParsingProperties`.
+        summary_only (bool): Only keeps the summaries (`-s`).
+        file_list (bool): Only lists the files of the document (`-f`).
+        input_paths (list): Directories searched for input files.
+        texinputs (str): Used in place of the `TEXINPUTS` variable.
+        cache (ParseCache): Lines of interest of the files already parsed.
+        stream (bool): Spools the summary to a temporary file (`--stream`).
+        jobs (int): Reads the files in that many processes first (`--jobs`).
+        verbose (bool): Prints the files and the modifiers met.
+        locations (bool): Writes the file and line of each record in a
+            comment after it, not with `--no-locations`.
+        only_file (str): Only summarises this file and the files it
+            includes (`--only-file`), see `DocumentPart`.
+        only_section (str): Only summarises the first section containing
+            this text (`--only-section`).
+        types (list): Only keeps these types of directives (`--types`), see
+            `ParsingProperties.select_types`.
+        exclude_types (list): Leaves out these types (`--exclude-types`).
+    """
+    def __init__(self, parseprops=None, summary_only=False, file_list=False,
+                 input_paths=(), texinputs=None, cache=None, stream=False,
+                 jobs=None, verbose=True, locations=True, only_file=None,
+                 only_section=None, types=None, exclude_types=()):
+        super(Summarizer, self).__init__()
+        if parseprops is None:
+            parseprops = ParsingProperties()
+        self.parseprops = copy.deepcopy(parseprops)
+        self.do_process_record = not file_list
+        self.generate_file_list = file_list
+        self.input_paths = list(input_paths)
+        self.texinputs = texinputs
+        self.cache = cache
+        self.stream = stream
+        self.jobs = jobs
+        self.verbose = verbose
+        self.locations = locations
+        self.only_file = only_file
+        self.only_section = only_section
+        self.profiler = None
+
+        self.record_writer_args = dict()
+        if summary_only:
+            self.parseprops.keep_only_summaries()
+            self.record_writer_args['name_change'] = \
+                default_name_change + "only"
+        if file_list:
+            self.record_writer_args['name_change'] = "_texfilelist"
+            self.record_writer_args['new_ext'] = '.txt'
+            self.record_writer_args['records_to_print'] = ['files']
+        if types is not None or exclude_types:
+            self.parseprops.select_types(types, exclude_types)
+            name_change = self.record_writer_args.get(
+                'name_change', default_name_change)
+            name_change += "".join("_" + t.lower() for t in types or ())
+            name_change += "".join("_no_" + t.lower() for t in exclude_types)
+            self.record_writer_args['name_change'] = name_change
+        if only_file is not None or only_section is not None:
+            name_change = self.record_writer_args.get(
+                'name_change', default_name_change)
+            self.record_writer_args['name_change'] = name_change + "part"
+
+    def new_resolver(self, base_directory=""):
+        return PathResolver(self.input_paths, self.texinputs, base_directory)
+
+    def new_parser(self, cache=None, resolver=None):
+        if resolver is None:
+            resolver = self.new_resolver()
+        part = None
+        if self.only_file is not None or self.only_section is not None:
+            part = DocumentPart(self.only_file, self.only_section)
+        # The triggers, and the matcher built from them on first use, are
+        # only copied by the parsers meeting a modifier
+        parser = Parser(
+            self.parseprops, resolver,
+            new_records(self.stream),
+            do_process_record=self.do_process_record,
+            generate_file_list=self.generate_file_list,
+            cache=cache, verbose=self.verbose, locations=self.locations,
+            part=part, shared_parseprops=True)
+        if self.profiler is not None:
+            self.profiler.install(parser)
+        return parser
+
+    def parse(self, file_name, cache=None, directives=None, visited=None,
+              resolver=None):
+        """Returns the records and counters of the document `file_name`
+
+        `cache` is used in place of the one of the summarizer, with `jobs`
+        the files are otherwise read in parallel first. The directives are
+        appended to `directives` and the files of the document to `visited`
+        if they are set, see `Parser`. `resolver` is used in place of a new
+        `PathResolver`.
+        """
+        if cache is None and self.jobs:
+            cache = prescan_tree(
+                file_name, self.jobs, self.parseprops, self.new_resolver(),
+                self.do_process_record)
+        elif cache is None:
+            cache = self.cache
+        parser = self.new_parser(cache, resolver)
+        parser.directives = directives
+        parser.visited = visited
+        parsed = parser.parse_file(file_name)
+        unknown = parser.parseprops.unknown_types()
+        if unknown:
+            raise ValueError(
+                "Unknown directive type : " + ", ".join(unknown))
+        return parsed
+
+    def output_name(self, file_name, file_out=None):
+        """Returns the name of the file `write` writes"""
+        if file_out is not None:
+            return file_out
+        return summary_file_name(
+            file_name, self.record_writer_args.get('name_change'),
+            self.record_writer_args.get('new_ext'))
+
+    def write(self, records, file_name, file_out=None):
+        """Writes `records` next to `file_name`, or to `file_out`"""
+        write = write_records
+        if self.profiler is not None:
+            write = self.profiler.timed(write_records, "writing")
+        write(records, file_name, file_out=file_out,
+              **self.record_writer_args)
+
+
+class PollingWatcher(object):
+    """Waits for a change of files by comparing their modification times"""
+    def __init__(self, interval=0.2):
+        super(PollingWatcher, self).__init__()
+        self.interval = interval
+        self.mtimes = {}
+
+    def _mtime(self, file_name):
+        try:
+            return os.stat(file_name).st_mtime_ns
+        except OSError:
+            return None
+
+    def wait(self, files):
+        mtimes = {f: self.mtimes.get(f, self._mtime(f)) for f in files}
+        while True:
+            changed = {f for f in files if self._mtime(f) != mtimes[f]}
+            if changed:
+                self.mtimes = {f: self._mtime(f) for f in files}
+                return changed
+            time.sleep(self.interval)
+
+
+class InotifyWatcher(object):
+    """
+    Waits for a change of files using the inotify API of Linux
+
+    The directories of the files are watched rather than the files so that
+    editors saving by replacing the file are caught. For a file whose
+    directory does not exist the closest existing parent is watched, the
+    creation of the missing directory counts as a change of the file.
+    """
+    # IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+    event_mask = 0x2 | 0x8 | 0x80 | 0x100 | 0x200
+    debounce = 0.05  # Editors write files in several steps
+
+    def __init__(self):
+        import ctypes
+        import ctypes.util
+        import struct
+        super(InotifyWatcher, self).__init__()
+        self.event_header = struct.Struct("iIII")  # wd, mask, cookie, len
+        self.get_errno = ctypes.get_errno
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(self.get_errno(), "inotify_init1 failed")
+        self.directories = {}
+
+    @staticmethod
+    def _event_path(file_name):
+        # The file, or its first missing parent directory
+        path = os.path.abspath(file_name)
+        directory = os.path.dirname(path)
+        while not os.path.isdir(directory) and directory != path:
+            path, directory = directory, os.path.dirname(directory)
+        return path
+
+    def _watch_directories(self, paths):
+        directories = {os.path.dirname(path) for path in paths}
+        for directory in set(self.directories.values()) - directories:
+            wd = [wd for wd in self.directories
+                  if self.directories[wd] == directory][0]
+            self.libc.inotify_rm_watch(self.fd, wd)
+            del self.directories[wd]
+        for directory in directories - set(self.directories.values()):
+            wd = self.libc.inotify_add_watch(
+                self.fd, os.fsencode(directory), self.event_mask)
+            if wd >= 0:
+                self.directories[wd] = directory
+
+    def _read_events(self):
+        buffer = os.read(self.fd, 64 * 1024)
+        offset = 0
+        while offset < len(buffer):
+            wd, _, _, length = self.event_header.unpack_from(buffer, offset)
+            offset += self.event_header.size
+            name = buffer[offset:offset + length].rstrip(b"\0")
+            offset += length
+            if wd in self.directories:
+                yield os.path.join(self.directories[wd], os.fsdecode(name))
+
+    def wait(self, files):
+        import select
+        watched = {}
+        for f in files:
+            watched.setdefault(self._event_path(f), set()).add(f)
+        self._watch_directories(watched)
+        changed = set()
+        while not changed:
+            for path in self._read_events():
+                changed.update(watched.get(path, ()))
+        while select.select([self.fd], [], [], self.debounce)[0]:
+            for path in self._read_events():
+                changed.update(watched.get(path, ()))
+        return changed
+
+
+def file_watcher():
+    """Returns an `InotifyWatcher` if available or a `PollingWatcher`"""
+    try:
+        return InotifyWatcher()
+    except (AttributeError, OSError, TypeError):
+        return PollingWatcher()
+
+
+def watch(summarizer, file_name, file_out=None, watcher=None):
+    """Rebuilds the summary every time a file of the document changes
+
+    Files which did not change are replayed from a `MemoryCache`, the files
+    watched are the ones visited by the last parse so that added and removed
+    include commands are followed. The candidates of the included files
+    which are not found are watched too, creating one rebuilds the summary.
+    """
+    import traceback
+    if watcher is None:
+        watcher = file_watcher()
+    cache = MemoryCache()
+    resolver = summarizer.new_resolver()
+    files = {file_name}
+    try:
+        while True:
+            start = time.time()
+            resolver.reset()
+            try:
+                records, counters = summarizer.parse(
+                    file_name, cache, resolver=resolver)
+                summarizer.write(records, file_name, file_out)
+                files = cache.visited
+                print("Summary updated in {0:.0f} ms.".format(
+                    1000 * (time.time() - start)))
+            except Exception:
+                traceback.print_exc()
+                files = files | set(cache.used.values())
+                cache.used = {}
+            print("Waiting for changes...")
+            changed = watcher.wait(files | resolver.missing | {file_name})
+            print("Changed : " + ", ".join(sorted(changed)))
+    except KeyboardInterrupt:
+        pass
+
+
+def summarize_document(summarizer, file_name):
+    """Builds and writes the summary of a document of a batch
+
+    Returns:
+        OrderedDict: Entry of the document in the run report, the error of a
+        document which fails is reported in it rather than raised.
+    """
+    import traceback
+    start = time.perf_counter()
+    report = OrderedDict([("file", file_name), ("status", "ok")])
+    try:
+        records, counters = summarizer.parse(file_name)
+        summarizer.write(records, file_name)
+        report["counters"] = counters
+    except Exception:
+        report["status"] = "error"
+        report["error"] = traceback.format_exc()
+    report["seconds"] = time.perf_counter() - start
+    return report
+
+
+# Summarizer of a batch worker process, set once by `init_batch_worker`
+batch_summarizer = None
+
+
+def init_batch_worker(summarizer):
+    global batch_summarizer
+    batch_summarizer = summarizer
+
+
+def summarize_batch_document(file_name):
+    return summarize_document(batch_summarizer, file_name)
+
+
+def summarize_batch(summarizer, file_names, workers=None):
+    """Builds the summaries of many documents
+
+    The documents are shared between `workers` processes, each one receives
+    the `summarizer` once, its compiled triggers are then used for all the
+    documents it handles.
+
+    Returns:
+        list: The report of each document, see `summarize_document`.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    if workers == 1 or len(file_names) < 2:
+        return [summarize_document(summarizer, file_name)
+                for file_name in file_names]
+    with ProcessPoolExecutor(workers, initializer=init_batch_worker,
+                             initargs=(summarizer,)) as executor:
+        return list(executor.map(summarize_batch_document, file_names))
+
+
+def batch_file_names(arguments):
+    """Expands the glob patterns and `@list` files of `--batch`"""
+    import glob
+    file_names = []
+    for argument in arguments:
+        if argument.startswith("@"):  # file listing a document per line
+            with open(argument[1:], 'r') as f:
+                file_names.extend(line.strip() for line in f if line.strip())
+        else:
+            file_names.extend(
+                sorted(glob.glob(argument, recursive=True)) or [argument])
+    return file_names
+
+
+def update_index(index_name, file_name, directives):
+    """Writes the `directives` of the document `file_name` to the
+    `DirectiveIndex` `index_name` (`--index`)"""
+    index = DirectiveIndex(index_name)
+    changed = index.update(file_name, directives)
+    index.close()
+    print("Index updated, {0} files rewritten.".format(len(changed)))
+
+
+def main():
+
+    summarizer_args = dict()
+    file_out = None
+    if len(sys.argv) > 1:
+        if "-s" in sys.argv:  # parse only summaries
+            summarizer_args['summary_only'] = True
+        if "-f" in sys.argv:  # parse only file list
+            summarizer_args['file_list'] = True
+        if "--cache" in sys.argv:  # reuse the parse of unchanged files
+            summarizer_args['cache'] = ParseCache(
+                sys.argv[sys.argv.index("--cache") + 1])
+        if "--input-path" in sys.argv:  # roots to search for input files
+            summarizer_args['input_paths'] = [
+                sys.argv[i + 1] for i, arg in enumerate(sys.argv)
+                if arg == "--input-path"]
+        if "--stream" in sys.argv:  # write the summary as it is parsed
+            summarizer_args['stream'] = True
+        if "-o" in sys.argv:  # output file, "-" for the standard output
+            file_out = sys.argv[sys.argv.index("-o") + 1]
+        if "--no-locations" in sys.argv:  # no file:line comment per record
+            summarizer_args['locations'] = False
+        if "--only-file" in sys.argv:  # summary of a file and its includes
+            summarizer_args['only_file'] = sys.argv[
+                sys.argv.index("--only-file") + 1]
+        if "--only-section" in sys.argv:  # summary of a single section
+            summarizer_args['only_section'] = sys.argv[
+                sys.argv.index("--only-section") + 1]
+        if "--types" in sys.argv:  # only these directives, comma separated
+            summarizer_args['types'] = sys.argv[
+                sys.argv.index("--types") + 1].split(",")
+        if "--exclude-types" in sys.argv:  # all directives but these
+            summarizer_args['exclude_types'] = sys.argv[
+                sys.argv.index("--exclude-types") + 1].split(",")
+
+    jobs = None
+    if "--jobs" in sys.argv:  # read the files in parallel before parsing
+        jobs = int(sys.argv[sys.argv.index("--jobs") + 1])
+
+    if "--batch" in sys.argv:  # summarise many documents, jobs processes
+        import json
+        arguments = sys.argv[sys.argv.index("--batch") + 1:]
+        for i, argument in enumerate(arguments):
+            if argument.startswith("-"):
+                arguments = arguments[:i]
+                break
+        report_name = "latex_summary_report.json"
+        if "--report" in sys.argv:
+            report_name = sys.argv[sys.argv.index("--report") + 1]
+
+        start = time.perf_counter()
+        summarizer = Summarizer(module_parseprops, verbose=False,
+                                **summarizer_args)
+        reports = summarize_batch(
+            summarizer, batch_file_names(arguments), jobs)
+        failed = [report for report in reports if report["status"] != "ok"]
+        for report in reports:
+            print("{0} : {1} ({2:.0f} ms)".format(
+                report["file"], report["status"], 1000 * report["seconds"]))
+        with open(report_name, 'w') as f:
+            json.dump(OrderedDict([
+                ("documents", reports),
+                ("failed", len(failed)),
+                ("seconds", time.perf_counter() - start),
+            ]), f, indent=2)
+        print("{0} documents, {1} failed, report : {2}".format(
+            len(reports), len(failed), report_name))
+        return 1 if failed else 0
+
+    file_name = sys.argv[1]
+
+    directives = None
+    if "--index" in sys.argv:  # export the directives to a SQLite database
+        directives = []
+    visited = None
+    if "--deps" in sys.argv:  # make dependency file of the summary
+        visited = []
+
+    if "--all" in sys.argv:  # all the outputs from a single read
+        import latex_singlefile
+        for option in ("-o", "--cache"):
+            if option in sys.argv:  # several outputs, each file read once
+                print("{0} cannot be used with --all".format(option),
+                      file=sys.stderr)
+                return 2
+        resolver = PathResolver(summarizer_args.get('input_paths', ()))
+        for mode in ('summary_only', 'file_list', 'only_file',
+                     'only_section', 'types', 'exclude_types'):
+            summarizer_args.pop(mode, None)
+        summarizers = [
+            Summarizer(module_parseprops, **summarizer_args),
+            Summarizer(module_parseprops, summary_only=True,
+                       **summarizer_args),
+            Summarizer(module_parseprops, file_list=True, **summarizer_args),
+        ]
+        parsers = [summarizer.new_parser(resolver=resolver)
+                   for summarizer in summarizers]
+        parsers[0].directives = directives
+        parsers[0].visited = visited
+        regex_keep = latex_singlefile.keep_text
+        if "-c" in sys.argv:  # concatenation without the comments
+            regex_keep = latex_singlefile.keep_uncommented_text
+        concatenated_name = latex_singlefile.concatenated_file_name(file_name)
+        with replaced_file(concatenated_name) as file_out:
+            # Only the concatenation stops at the document of subfiles
+            parseprops = copy.deepcopy(module_parseprops)
+            parseprops.file_parsing_modifiers["subfile"] = \
+                latex_singlefile.subfile_recording
+            concatenation = latex_singlefile.Concatenation(
+                file_out,
+                Parser(parseprops, resolver, do_process_record=False),
+                regex_keep)
+            walk_file(file_name, parsers + [concatenation])
+        for summarizer, parser in zip(summarizers, parsers):
+            summarizer.write(parser.records, file_name)
+        if visited is not None:
+            print("Written : " + write_dependencies(
+                summarizers[0].output_name(file_name), visited))
+        if directives is not None:
+            update_index(sys.argv[sys.argv.index("--index") + 1], file_name,
+                         directives)
+        return
+
+    summarizer_args['jobs'] = jobs
+    summarizer = Summarizer(module_parseprops, **summarizer_args)
+
+    if "--watch" in sys.argv:  # rebuild the summary on every change
+        watch(summarizer, file_name, file_out)
+        return
+
+    profiler = None
+    if "--profile" in sys.argv:  # time the patterns, files and phases
+        import json
+        profiler = summarizer.profiler = Profiler()
+        profiler.start_run()
+
+    if "--diff" in sys.argv:  # changes of the directives since a revision
+        old_file = sys.argv[sys.argv.index("--diff") + 1]
+        if os.path.isdir(old_file):  # same main file in another tree
+            old_file = os.path.join(old_file, os.path.basename(file_name))
+        delta = diff_documents(summarizer, old_file, file_name)
+        print(", ".join("{0} {1}".format(len(delta[kind]), kind)
+                        for kind in diff_kinds) + ".")
+        print("Written : {0}, {1}".format(*write_diff(delta, file_name)))
+        return
+
+    log = contextlib.nullcontext()
+    if file_out == "-":
+        log = contextlib.redirect_stdout(sys.stderr)  # keeps the output clean
+    with log:
+        records, counters = summarizer.parse(
+            file_name, directives=directives, visited=visited)
+    summarizer.write(records, file_name, file_out)
+    if visited is not None:
+        target = summarizer.output_name(file_name, file_out)
+        if target == "-":
+            target = summarizer.output_name(file_name)
+        with log:
+            print("Written : " + write_dependencies(target, visited))
+
+    if directives is not None:
+        with log:
+            update_index(sys.argv[sys.argv.index("--index") + 1], file_name,
+                         directives)
+
+    if profiler is not None:
+        profiler.stop_run()
+        with log:
+            profiler.print_report()
+        with open(os.path.splitext(file_name)[0] + "_profile.json", 'w') as f:
+            json.dump(profiler.to_json(), f, indent=2)
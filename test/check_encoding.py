@@ -0,0 +1,89 @@
+"""
+Checks that the outputs of `main_encoding.tex`, which includes a Latin-1
+file from a UTF-8 one, are written in UTF-8 under a locale which is not
+UTF-8 (`LC_ALL=C`, without the coercion of the locale and the UTF-8 mode):
+
+    python test/check_encoding.py
+
+The summary, `--stream`, `-o -`, `--diff` and the concatenation of
+`latex_singlefile.py` are checked on a copy of the test directory.
+"""
+import os
+import sys
+import shutil
+import tempfile
+import subprocess
+
+test_directory = os.path.dirname(os.path.abspath(__file__))
+scripts = os.path.dirname(test_directory)
+main_file = "main_encoding.tex"
+expected = ["Données en UTF-8", "Vérifier les accents",
+            "Résumé en Latin-1", "« déjà vu »"]
+
+# (arguments, output file, None for the standard output)
+runs = [
+    (["latex_summary.py", main_file], "main_encoding_auto_summary.tex"),
+    (["latex_summary.py", main_file, "--stream", "-o", "stream.tex"],
+     "stream.tex"),
+    (["latex_summary.py", main_file, "-o", "-"], None),
+    (["latex_summary.py", main_file, "--diff", "old"],
+     "main_encoding_auto_diff.tex"),
+    (["latex_singlefile.py", main_file], "main_encoding_auto_concatenate.tex"),
+    (["latex_singlefile.py", main_file, "-o", "-"], None),
+]
+
+
+def locale_environment():
+    env = dict(os.environ, LC_ALL="C", LANG="C", PYTHONCOERCECLOCALE="0",
+               PYTHONUTF8="0")
+    env.pop("PYTHONIOENCODING", None)
+    return env
+
+
+def check_run(directory, arguments, output_name):
+    """Returns the problems of a run, an empty list if there are none"""
+    command = [sys.executable, "-X", "utf8=0",
+               os.path.join(scripts, arguments[0])] + arguments[1:]
+    process = subprocess.run(command, cwd=directory, env=locale_environment(),
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if process.returncode != 0:
+        return ["exit status {0}: {1}".format(
+            process.returncode, process.stderr.decode(errors="replace"))]
+    if output_name is None:
+        data = process.stdout
+    else:
+        with open(os.path.join(directory, output_name), 'rb') as f:
+            data = f.read()
+    try:
+        text = data.decode("utf-8")
+    except UnicodeDecodeError as e:
+        return ["not UTF-8: {0}".format(e)]
+    if "--diff" in arguments:  # the directives of old/ are removed
+        return [] if "Vérifier les accents" in text else [
+            "the directives are missing"]
+    return ["missing {0!r}".format(sentence)
+            for sentence in expected if sentence not in text]
+
+
+if __name__ == "__main__":
+    failed = False
+    directory = tempfile.mkdtemp()
+    try:
+        for name in (main_file, "encoding_test"):
+            source = os.path.join(test_directory, name)
+            if os.path.isdir(source):
+                shutil.copytree(source, os.path.join(directory, name))
+            else:
+                shutil.copy(source, directory)
+        os.mkdir(os.path.join(directory, "old"))
+        with open(os.path.join(directory, "old", main_file), 'w') as f:
+            f.write("\\begin{document}\n\\end{document}\n")
+        for arguments, output_name in runs:
+            for problem in check_run(directory, arguments, output_name):
+                print("{0}: {1}".format(" ".join(arguments), problem))
+                failed = True
+    finally:
+        shutil.rmtree(directory)
+    if failed:
+        sys.exit(1)
+    print("The outputs are written in UTF-8 under the C locale.")
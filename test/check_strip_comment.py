@@ -0,0 +1,55 @@
+"""
+Checks that `latex_singlefile.strip_comment` keeps what the regexp
+`keep_uncommented_text` keeps, which it replaces for `-c`.
+
+Every line of up to `max_length` characters made of "a", backslashes, "%"
+and spaces is compared, then random longer lines:
+
+    python test/check_strip_comment.py
+"""
+import os
+import re
+import sys
+import random
+import itertools
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import latex_singlefile  # noqa: E402
+
+alphabet = "a\\% "
+max_length = 8
+
+
+def mismatches(lines):
+    """Yields the (line, kept by the regexp, kept by strip_comment) which
+    differ"""
+    keep = latex_singlefile.line_keeper(latex_singlefile.keep_uncommented_text)
+    keep_re = re.compile(latex_singlefile.keep_uncommented_text)
+    for line in lines:
+        expected = keep_re.search(line).group(0)
+        if keep(line) != expected:
+            yield line, expected, keep(line)
+
+
+def all_lines():
+    for length in range(max_length + 1):
+        for chars in itertools.product(alphabet, repeat=length):
+            yield "".join(chars)
+
+
+def random_lines(n_lines=100000, max_random_length=30, seed=1):
+    rand = random.Random(seed)
+    for _ in range(n_lines):
+        yield "".join(rand.choice("ab\\\\%% \\")
+                      for _ in range(rand.randrange(max_random_length)))
+
+
+if __name__ == "__main__":
+    failed = False
+    for line, expected, kept in mismatches(
+            itertools.chain(all_lines(), random_lines())):
+        print("{0!r}: {1!r} expected, {2!r} kept".format(line, expected, kept))
+        failed = True
+    if failed:
+        sys.exit(1)
+    print("strip_comment keeps the same text as keep_uncommented_text.")